@@ -1,9 +1,19 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
 import heapq
 import random
 import time
 import math
+from array import array
+
+# tkinter is imported on demand by _load_tk(), so headless use (CLI, batch,
+# simulator, worker processes) never pays for Tk or needs a display.
+tk = ttk = messagebox = filedialog = None
+
+def _load_tk():
+    global tk, ttk, messagebox, filedialog
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as _ttk, messagebox as _mb, filedialog as _fd
+        tk, ttk, messagebox, filedialog = tkinter, _ttk, _mb, _fd
 
 # ─────────────────────────────────────────────
 #  GLOBAL CONFIGURATION
@@ -12,6 +22,7 @@ DEFAULT_ROWS    = 18
 DEFAULT_COLS    = 22
 CELL_SIZE       = 36
 ANIMATION_DELAY = 0.025   # seconds between steps
+SEARCH_POLL     = 256     # expansions between Tk event pumps while searching
 
 BG_DEEP     = "#0d0f18"   # deepest background
 BG_BASE     = "#11131f"   # main background
@@ -89,12 +100,1900 @@ def h_octile(r, c, gr, gc):
     dx = abs(r - gr);  dy = abs(c - gc)
     return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
 
+HEURISTICS = {
+    "Manhattan": h_manhattan,
+    "Euclidean": h_euclidean,
+    "Chebyshev": h_chebyshev,
+    "Octile":    h_octile,
+}
+
+
+# ─────────────────────────────────────────────
+#  HEADLESS SEARCH CORE
+# ─────────────────────────────────────────────
+DIAGONAL_COST = 1.414
+
+def occupancy_from_grid(grid):
+    """Flatten a rows×cols grid (-1 = wall) into a bytearray (1 = wall)."""
+    return bytearray(1 if v == -1 else 0 for row in grid for v in row)
+
+def move_cost(dr, dc):
+    return DIAGONAL_COST if (dr, dc) in DIAGONAL_MOVES else 1.0
+
+def path_cost(path):
+    """
+    Total step cost of a cell path (diagonals cost 1.414).  Legs between
+    non-adjacent cells, as in an any-angle waypoint list, cost their
+    straight-line length.
+    """
+    total = 0.0
+    for i in range(len(path)-1):
+        dr = path[i+1][0]-path[i][0];  dc = path[i+1][1]-path[i][1]
+        if abs(dr) <= 1 and abs(dc) <= 1:
+            total += move_cost(dr, dc)
+        else:
+            total += math.hypot(dr, dc)
+    return total
+
+def extract_path(goal_node):
+    path = []
+    n = goal_node
+    while n:
+        path.append(n.pos())
+        n = n.parent
+    path.reverse()
+    return path
+
+def search_grid(occ, rows, cols, start, target, algo="A*", heuristic="Manhattan",
+                on_expand=None, on_push=None, keep_going=None, stats=None,
+                los=None, tt_size=None, on_layer=None, diagonal=True):
+    """
+    Unified A* / GBFS over a flat occupancy buffer (non-zero = wall).
+    `occ` may be any indexable byte buffer — bytearray, bytes or a
+    shared-memory view.  `heuristic` is a HEURISTICS name or a callable
+    h(r, c, gr, gc).  The optional callbacks let the GUI animate:
+    on_expand(r, c) / on_push(r, c) fire per cell, keep_going() is polled
+    once per expansion and aborts the search when it returns False.
+    Pass a SearchStats to count and time heap ops, neighbour generation and
+    heuristic calls (this adds a few clock reads per node).
+    Lazy Theta* is dispatched to lazy_theta_star (its heuristic is always
+    Euclidean); `los` is an optional shared LineOfSightCache for it.
+    IDA* is dispatched to ida_star with a `tt_size`-entry table, and the
+    NumPy wavefront to wavefront_search (on_layer gets one batch per layer;
+    diagonal=False limits it to 4 moves — the other searches are 8-way).
+    Returns (goal Node with parent chain or None, nodes expanded).
+    """
+    if algo == THETA_ALGO:
+        return lazy_theta_star(occ, rows, cols, start, target, los=los,
+                               on_expand=on_expand, on_push=on_push,
+                               keep_going=keep_going, stats=stats)
+    if algo == IDA_ALGO:
+        return ida_star(occ, rows, cols, start, target, heuristic,
+                        tt_size=tt_size or DEFAULT_TT_SIZE,
+                        on_expand=on_expand, on_push=on_push,
+                        keep_going=keep_going, stats=stats)
+    if algo == WAVEFRONT_ALGO:
+        return wavefront_search(occ, rows, cols, start, target, diagonal,
+                                on_layer=on_layer, on_expand=on_expand,
+                                keep_going=keep_going, stats=stats)
+    h_fn   = heuristic if callable(heuristic) else HEURISTICS[heuristic]
+    greedy = "GBFS" in algo
+    gr, gc = target
+    sr, sc = start
+    push, pop = heapq.heappush, heapq.heappop
+    if stats is not None:
+        h_fn, push, pop = stats.instrument(h_fn, push, pop)
+        t_start = time.perf_counter()
+
+    s_node = Node(sr, sc, None, g=0, h=h_fn(sr, sc, gr, gc))
+    s_node.f = s_node.h if greedy else s_node.g + s_node.h
+
+    heap    = []
+    counter = 0
+    push(heap, (s_node.f, counter, s_node))
+
+    open_map = {(sr, sc): s_node.f}   # pos -> f  for fast updates
+    closed   = set()
+    expanded = 0
+    goal     = None
+
+    while heap:
+        if keep_going is not None and not keep_going():
+            break
+        _, _, curr = pop(heap)
+        pos = curr.pos()
+        if pos in closed: continue
+
+        closed.add(pos)
+        expanded += 1
+        if on_expand is not None:
+            on_expand(curr.r, curr.c)
+
+        if pos == target:
+            goal = curr
+            break
+
+        if stats is not None:
+            t_nb = time.perf_counter()
+            t_inner = stats.nested_seconds()
+        for dr, dc in MOVES:
+            nr, nc = curr.r+dr, curr.c+dc
+            if not (0 <= nr < rows and 0 <= nc < cols): continue
+            if occ[nr*cols + nc]: continue
+            npos = (nr, nc)
+            if npos in closed: continue
+
+            nb = Node(nr, nc, curr, curr.g + move_cost(dr, dc), h_fn(nr, nc, gr, gc))
+            nb.f = nb.h if greedy else nb.g + nb.h
+
+            if npos not in open_map or nb.f < open_map[npos]:
+                if stats is not None and npos in open_map:
+                    stats.repushes += 1
+                open_map[npos] = nb.f
+                counter += 1
+                push(heap, (nb.f, counter, nb))
+                if on_push is not None:
+                    on_push(nr, nc)
+        if stats is not None:
+            # Loop time minus the heuristic / heap / render time spent inside it
+            inner = stats.nested_seconds() - t_inner
+            stats.add("neighbors", time.perf_counter() - t_nb - inner)
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.add("search", time.perf_counter() - t_start)
+    return goal, expanded
+
+def find_path(occ, rows, cols, start, target, algo="A*", heuristic="Manhattan",
+              landmarks=None, stats=None, los=None, tt_size=None, diagonal=True):
+    """
+    Headless query: returns (cell path or [] if unreachable, nodes expanded).
+    For Lazy Theta* the path is its waypoint list — densify() turns it into
+    cells.  For the ALT heuristic pass a prebuilt LandmarkTable to reuse
+    across queries; otherwise one is built for this call.  `diagonal` only
+    affects the wavefront (see search_grid).
+    """
+    if heuristic == ALT_HEURISTIC and algo not in NO_HEURISTIC_ALGOS:
+        if landmarks is None:
+            landmarks = LandmarkTable(occ, rows, cols)
+        heuristic = landmarks.heuristic(target)
+    goal, expanded = search_grid(occ, rows, cols, start, target, algo, heuristic,
+                                 stats=stats, los=los, tt_size=tt_size,
+                                 diagonal=diagonal)
+    return (extract_path(goal) if goal else []), expanded
+
+
+# ─────────────────────────────────────────────
+#  MEMORY-BOUNDED SEARCH (IDA*)
+# ─────────────────────────────────────────────
+IDA_ALGO        = "IDA* (bounded)"
+DEFAULT_TT_SIZE    = 1 << 16   # 16 bytes per slot: 1 MiB (never more than rows*cols)
+DEFAULT_BOUND_STEP = 1.0       # path cost <= optimal + this
+_TT_EPS            = 1e-9
+
+def _reachable(occ, rows, cols, src, goal, keep_going=None):
+    """
+    Whether `goal` lies in `src`'s 8-connected component.  Two flood fills,
+    one from each end, grow their smaller frontier a layer at a time over
+    bit-packed visited sets (rows*cols/8 bytes each), so this keeps
+    ida_star's memory bound; it stops when they meet, or as soon as either
+    side's component is used up.  None if keep_going() stopped it.
+    """
+    if src == goal:
+        return True
+    size = (rows * cols + 7) >> 3
+    seen = [bytearray(size), bytearray(size)]
+    layers = [array("i", [src]), array("i", [goal])]
+    for side, cell in enumerate((src, goal)):
+        seen[side][cell >> 3] |= 1 << (cell & 7)
+    while layers[0] and layers[1]:
+        if keep_going is not None and not keep_going():
+            return None
+        side  = 0 if len(layers[0]) <= len(layers[1]) else 1
+        mine, other = seen[side], seen[1 - side]
+        nxt = array("i")
+        for cell in layers[side]:
+            r, c = divmod(cell, cols)
+            for dr, dc in MOVES:
+                nr, nc = r+dr, c+dc
+                if not (0 <= nr < rows and 0 <= nc < cols): continue
+                n = nr*cols + nc
+                byte, bit = n >> 3, 1 << (n & 7)
+                if occ[n] or mine[byte] & bit: continue
+                if other[byte] & bit:
+                    return True
+                mine[byte] |= bit
+                nxt.append(n)
+        layers[side] = nxt
+    return False
+
+def ida_star(occ, rows, cols, start, target, heuristic="Octile",
+             tt_size=DEFAULT_TT_SIZE, on_expand=None, on_push=None,
+             keep_going=None, stats=None, bound_step=DEFAULT_BOUND_STEP):
+    """
+    Iterative-deepening A*: repeated depth-first searches bounded by
+    f = g + h.  With 1 / 1.414 step costs the f values are almost
+    continuous, so raising the bound only to the smallest f that exceeded
+    it takes an iteration per value; instead it rises by at least
+    `bound_step`.  Every iteration below the optimum C* fails, so the
+    first path found costs at most C* + bound_step (0 gives exact IDA*).
+
+    Memory is the current DFS path plus a direct-mapped transposition
+    table of `tt_size` slots, capped at rows*cols (cell -> cheapest g seen
+    so far).  A visit costlier than the table's g is dominated and pruned,
+    as is a repeat at equal g within one iteration.  A slot lost to a
+    collision costs re-expansions, so the table should hold roughly as
+    many cells as A* would close; at the cap every cell has its own slot.
+    It still takes 16 bytes a slot against A*'s Node, heap entry and
+    set / dict entries per cell.
+
+    An unreachable target would make every iteration re-walk the whole
+    start component until the bound passed its largest f, so bit-packed
+    flood fills (_reachable) rule that out first.
+    Returns (goal Node with parent chain or None, nodes expanded).
+    """
+    h_fn = heuristic if callable(heuristic) else HEURISTICS[heuristic]
+    if stats is not None:
+        h_fn, _, _ = stats.instrument(h_fn, heapq.heappush, heapq.heappop)
+        t_start = time.perf_counter()
+    gr, gc = target
+    goal   = gr*cols + gc
+    src    = start[0]*cols + start[1]
+    steps  = [(dr, dc, move_cost(dr, dc)) for dr, dc in MOVES]
+    # 2654435761 is prime, so with tt_size == rows*cols no two cells share a slot
+    tt_size = max(1, min(tt_size, rows * cols))
+
+    if not _reachable(occ, rows, cols, src, goal, keep_going):
+        if stats is not None:
+            stats.add("search", time.perf_counter() - t_start)
+        return None, 0
+
+    tt_cell = array("i", [-1]) * tt_size
+    tt_g    = array("d", [0.0]) * tt_size
+    tt_iter = array("i", [0]) * tt_size
+
+    bound     = h_fn(start[0], start[1], gr, gc)
+    expanded  = 0
+    iteration = 0
+    found     = None
+
+    while found is None and bound < math.inf:
+        iteration += 1
+        next_bound = math.inf
+        on_path = {src}
+        stack   = [[src, 0.0, None]]          # cell, g, iterator over children
+        while stack:
+            if keep_going is not None and not keep_going():
+                stack = [];  bound = math.inf
+                break
+            frame = stack[-1]
+            cell, g, children = frame
+            if children is None:
+                r, c = divmod(cell, cols)
+                f = g + h_fn(r, c, gr, gc)
+                if f > bound + _TT_EPS:
+                    next_bound = min(next_bound, f)
+                    stack.pop();  on_path.discard(cell)
+                    continue
+                if cell == goal:
+                    found = [fr[0] for fr in stack]
+                    break
+                slot = (cell * 2654435761) % tt_size
+                if tt_cell[slot] == cell and (
+                        g > tt_g[slot] + _TT_EPS or
+                        (tt_iter[slot] == iteration and g > tt_g[slot] - _TT_EPS)):
+                    stack.pop();  on_path.discard(cell)
+                    continue
+                tt_cell[slot], tt_g[slot], tt_iter[slot] = cell, g, iteration
+
+                expanded += 1
+                if on_expand is not None:
+                    on_expand(r, c)
+                kids = []
+                for dr, dc, w in steps:
+                    nr, nc = r+dr, c+dc
+                    if not (0 <= nr < rows and 0 <= nc < cols): continue
+                    nxt = nr*cols + nc
+                    if occ[nxt] or nxt in on_path: continue
+                    kids.append((g + w + h_fn(nr, nc, gr, gc), nxt << 1 | (w != 1.0)))
+                kids.sort()                       # most promising child first
+                # packed as cell << 1 | diagonal: a few bytes per child
+                frame[2] = children = iter(array("i", [k for _, k in kids]))
+
+            kid = next(children, -1)
+            if kid < 0:
+                stack.pop();  on_path.discard(cell)
+                continue
+            nxt = kid >> 1
+            if nxt in on_path: continue
+            on_path.add(nxt)
+            ng = g + (DIAGONAL_COST if kid & 1 else 1.0)
+            stack.append([nxt, ng, None])
+            if stats is not None and len(stack) > stats.heap_peak:
+                stats.heap_peak = len(stack)      # deepest DFS stack
+            if on_push is not None:
+                on_push(*divmod(nxt, cols))
+        if found is None and next_bound < math.inf:
+            bound = max(next_bound, bound + bound_step)
+        elif found is None:
+            bound = math.inf
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.add("search", time.perf_counter() - t_start)
+    if found is None:
+        return None, expanded
+    node = None
+    for cell in found:
+        r, c = divmod(cell, cols)
+        node = Node(r, c, node)
+    return node, expanded
+
+
+def _bench_child(occ, rows, cols, start, target, algo, heuristic, tt_size):
+    """Run one search in a fresh process and measure its memory."""
+    import resource, tracemalloc
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    route, expanded = find_path(occ, rows, cols, start, target, algo, heuristic,
+                                tt_size=tt_size)
+    elapsed = (time.perf_counter() - t0) * 1000
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()                  # second, traced run for Python heap peak
+    find_path(occ, rows, cols, start, target, algo, heuristic, tt_size=tt_size)
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"algo": algo, "found": bool(route), "cost": round(path_cost(route), 3),
+            "expanded": expanded, "time_ms": round(elapsed, 3),
+            "peak_rss_kb": rss1, "rss_growth_kb": rss1 - rss0,
+            "traced_peak_kb": round(traced / 1024, 1)}
+
+def benchmark_memory(grid, start, target, algos=("A*", IDA_ALGO),
+                     heuristic="Octile", tt_size=DEFAULT_TT_SIZE):
+    """
+    Compare expansions, time and memory of several strategies on one query.
+    Each strategy runs in its own freshly spawned process so peak RSS
+    (ru_maxrss) is not shared between them; the traced Python heap peak
+    comes from a second run under tracemalloc.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    occ  = bytes(occupancy_from_grid(grid))
+    rows, cols = len(grid), len(grid[0])
+    ctx  = multiprocessing.get_context("spawn")
+    out  = []
+    for algo in algos:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            out.append(ex.submit(_bench_child, occ, rows, cols, start, target,
+                                 algo, heuristic, tt_size).result())
+    return out
+
+
+# ─────────────────────────────────────────────
+#  VECTORISED WAVEFRONT (NumPy, optional)
+# ─────────────────────────────────────────────
+WAVEFRONT_ALGO = "Wavefront (NumPy)"
+
+def numpy_available():
+    import importlib.util
+    return importlib.util.find_spec("numpy") is not None
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("the wavefront mode needs NumPy: pip install numpy") from None
+    return numpy
+
+def _wavefront(occ, rows, cols, source, diagonal=True, target=None,
+               on_layer=None, keep_going=None):
+    """
+    Unit-cost BFS that expands a whole layer per step.  The grid is padded
+    with a wall border and flattened, so a cell's neighbours are the fixed
+    index offsets ±1, ±W (and ±W±1) with no bounds checks: each layer is
+    one broadcast add, one mask lookup and one np.unique over the frontier.
+    Stops after the layer holding `target`, if given.  on_layer(cells)
+    receives each layer as an int array of unpadded r*cols + c indices.
+    Returns (padded flat int32 distances, -1 = unreached, padded width).
+    """
+    np = _numpy()
+    W = cols + 2
+    open_ = np.zeros((rows + 2, W), dtype=bool)
+    open_[1:-1, 1:-1] = np.frombuffer(bytes(occ), dtype=np.uint8).reshape(rows, cols) == 0
+    open_ = open_.ravel()                       # free and not yet reached
+    dist  = np.full(open_.size, -1, dtype=np.int32)
+    offsets = [-W, W, -1, 1] + ([-W-1, -W+1, W-1, W+1] if diagonal else [])
+    offsets = np.array(offsets, dtype=np.intp)
+
+    src  = (source[0]+1)*W + source[1] + 1
+    goal = None if target is None else (target[0]+1)*W + target[1] + 1
+    if not open_[src]:
+        return dist, W
+    open_[src] = False
+    dist[src]  = 0
+    frontier = np.array([src], dtype=np.intp)
+    depth = 0
+    while frontier.size:
+        if on_layer is not None:
+            on_layer(frontier - W - 1 - 2*(frontier // W - 1))
+        if goal is not None and dist[goal] >= 0: break
+        if keep_going is not None and not keep_going(): break
+        depth += 1
+        nxt = (frontier[:, None] + offsets).ravel()
+        nxt = np.unique(nxt[open_[nxt]])
+        open_[nxt] = False
+        dist[nxt]  = depth
+        frontier   = nxt
+    return dist, W
+
+def wavefront_distances(occ, rows, cols, source, diagonal=True):
+    """Whole-grid step counts from `source` as a (rows, cols) int32 array; -1 = unreachable."""
+    dist, W = _wavefront(occ, rows, cols, source, diagonal)
+    return dist.reshape(rows + 2, W)[1:-1, 1:-1].copy()
+
+def wavefront_search(occ, rows, cols, start, target, diagonal=True,
+                     on_layer=None, on_expand=None, keep_going=None, stats=None):
+    """
+    Shortest path in moves (every step costs 1, diagonals included) by a
+    wavefront from `start`, then a walk back down the distance map.  With
+    8 moves the result is fewest-steps, not always cheapest under the
+    1.414 diagonal cost.  on_expand(r, c) is called per cell when no
+    on_layer callback is given.  Returns (goal Node chain or None, expanded).
+    """
+    if on_layer is None and on_expand is not None:
+        def on_layer(cells):
+            for i in cells.tolist():
+                on_expand(*divmod(i, cols))
+    t_start = time.perf_counter()
+    expanded = [0]
+    def count(cells, user=on_layer):
+        expanded[0] += len(cells)
+        if user is not None: user(cells)
+
+    dist, W = _wavefront(occ, rows, cols, start, diagonal, target, count, keep_going)
+    goal = (target[0]+1)*W + target[1] + 1
+    node = None
+    if dist[goal] >= 0:
+        steps = [-W, W, -1, 1] + ([-W-1, -W+1, W-1, W+1] if diagonal else [])
+        cells = [goal]
+        p, d = goal, int(dist[goal])
+        while d > 0:                    # any neighbour one layer closer will do
+            d -= 1
+            p = next(p + o for o in steps if dist[p + o] == d)
+            cells.append(p)
+        for p in reversed(cells):
+            r, c = divmod(p, W)
+            node = Node(r - 1, c - 1, node)
+    if stats is not None:
+        stats.expanded += expanded[0]
+        stats.add("search", time.perf_counter() - t_start)
+    return node, expanded[0]
+
+
+# ─────────────────────────────────────────────
+#  ANY-ANGLE PATHS (LAZY THETA*)
+# ─────────────────────────────────────────────
+THETA_ALGO        = "Lazy Theta*"
+DEFAULT_LOS_CACHE = 4096
+LOS_REGION        = 8      # invalidation block size, in cells
+
+def bresenham(a, b):
+    """Cells on the Bresenham line from a to b, both ends included."""
+    (r0, c0), (r1, c1) = a, b
+    dr = abs(r1 - r0);  dc = abs(c1 - c0)
+    sr = 1 if r1 >= r0 else -1
+    sc = 1 if c1 >= c0 else -1
+    err = dc - dr
+    out = [(r0, c0)]
+    while (r0, c0) != (r1, c1):
+        e2 = 2 * err
+        if e2 > -dr: err -= dr;  c0 += sc
+        if e2 <  dc: err += dc;  r0 += sr
+        out.append((r0, c0))
+    return out
+
+def sight_line(a, b):
+    """
+    Cells from a to b as LineOfSightCache sees them.  Bresenham is not
+    symmetric, so lines are always traced from the smaller end.
+    """
+    if a <= b: return bresenham(a, b)
+    return bresenham(b, a)[::-1]
+
+def densify(waypoints):
+    """Expand a waypoint list into the cells an agent walks through."""
+    if not waypoints: return []
+    cells = [waypoints[0]]
+    for a, b in zip(waypoints, waypoints[1:]):
+        cells.extend(sight_line(a, b)[1:])
+    return cells
+
+
+class LineOfSightCache:
+    """
+    Memoised Bresenham line-of-sight checks over an occupancy buffer,
+    with LRU eviction.  Each entry is indexed by the LOS_REGION-sized
+    blocks its line actually crosses (up to the first wall), so a wall
+    change drops only the lines that could be affected.
+    The buffer is shared, not copied: write walls through set_cell(), or
+    call invalidate() after writing to it yourself.
+    """
+    def __init__(self, occ, rows, cols, maxsize=DEFAULT_LOS_CACHE):
+        from collections import OrderedDict
+        self.occ, self.rows, self.cols = occ, rows, cols
+        self.maxsize   = maxsize
+        self.entries   = OrderedDict()   # (a, b) -> (visible, regions)
+        self.by_region = {}              # region -> set of keys
+        self.hits = self.misses = self.invalidated = 0
+
+    def visible(self, a, b):
+        key = (a, b) if a <= b else (b, a)   # trace one direction only
+        hit = self.entries.get(key)
+        if hit is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return hit[0]
+        self.misses += 1
+
+        occ, cols = self.occ, self.cols
+        ok, regions = True, set()
+        for r, c in sight_line(*key):
+            regions.add((r // LOS_REGION, c // LOS_REGION))
+            if occ[r*cols + c]:
+                ok = False
+                break
+        self.entries[key] = (ok, regions)
+        for reg in regions:
+            self.by_region.setdefault(reg, set()).add(key)
+        while len(self.entries) > self.maxsize:
+            self._drop(*self.entries.popitem(last=False))
+        return ok
+
+    def set_cell(self, r, c, wall):
+        self.occ[r*self.cols + c] = 1 if wall else 0
+        self.invalidate(r, c)
+
+    def invalidate(self, r, c):
+        """Forget every cached line crossing the block that holds (r, c)."""
+        for key in list(self.by_region.get((r // LOS_REGION, c // LOS_REGION), ())):
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self._drop(key, entry)
+                self.invalidated += 1
+
+    def _drop(self, key, entry):
+        for reg in entry[1]:
+            keys = self.by_region.get(reg)
+            if keys is not None:
+                keys.discard(key)
+                if not keys: del self.by_region[reg]
+
+
+def lazy_theta_star(occ, rows, cols, start, target, los=None,
+                    on_expand=None, on_push=None, keep_going=None, stats=None):
+    """
+    Lazy Theta* (Nash et al. 2010): A* whose nodes may take their parent's
+    parent as parent, giving any-angle paths.  Line of sight is checked
+    lazily — only when a node is expanded — and memoised in `los`.
+    Returns (goal Node whose parent chain is the waypoint list, expanded).
+    """
+    if los is None:
+        los = LineOfSightCache(occ, rows, cols)
+    gr, gc = target
+    h_fn   = h_euclidean
+    push, pop = heapq.heappush, heapq.heappop
+    if stats is not None:
+        h_fn, push, pop = stats.instrument(h_fn, push, pop)
+        t_start = time.perf_counter()
+
+    def dist(a, b): return math.hypot(a[0]-b[0], a[1]-b[1])
+
+    g       = {start: 0.0}
+    parent  = {start: start}
+    closed  = set()
+    heap    = [(h_fn(start[0], start[1], gr, gc), 0, start)]
+    counter = 0
+    expanded = 0
+    found    = False
+
+    while heap:
+        if keep_going is not None and not keep_going():
+            break
+        _, _, s = pop(heap)
+        if s in closed: continue
+
+        # SetVertex: the optimistic parent must actually be visible,
+        # otherwise fall back to the best already-expanded neighbour.
+        p = parent[s]
+        if p != s and not los.visible(p, s):
+            best = math.inf
+            for dr, dc in MOVES:
+                n = (s[0]+dr, s[1]+dc)
+                if n in closed and g[n] + dist(n, s) < best:
+                    best = g[n] + dist(n, s)
+                    parent[s] = n
+            g[s] = best
+
+        closed.add(s)
+        expanded += 1
+        if on_expand is not None:
+            on_expand(*s)
+        if s == target:
+            found = True
+            break
+
+        ps = parent[s]
+        for dr, dc in MOVES:
+            nr, nc = s[0]+dr, s[1]+dc
+            if not (0 <= nr < rows and 0 <= nc < cols): continue
+            if occ[nr*cols + nc]: continue
+            n = (nr, nc)
+            if n in closed: continue
+            ng = g[ps] + dist(ps, n)        # assume ps sees n; checked lazily
+            if ng < g.get(n, math.inf):
+                if stats is not None and n in g:
+                    stats.repushes += 1
+                g[n] = ng
+                parent[n] = ps
+                counter += 1
+                push(heap, (ng + h_fn(nr, nc, gr, gc), counter, n))
+                if on_push is not None:
+                    on_push(nr, nc)
+
+    if stats is not None:
+        stats.expanded += expanded
+        stats.add("search", time.perf_counter() - t_start)
+    if not found:
+        return None, expanded
+
+    chain = [target]
+    while chain[-1] != start:
+        chain.append(parent[chain[-1]])
+    node = None
+    for r, c in reversed(chain):
+        node = Node(r, c, node, g=g[(r, c)])
+    return node, expanded
+
+
+# ─────────────────────────────────────────────
+#  LANDMARK (ALT) HEURISTIC
+# ─────────────────────────────────────────────
+ALT_HEURISTIC      = "ALT"
+NO_HEURISTIC_ALGOS = (THETA_ALGO, WAVEFRONT_ALGO)   # ignore the heuristic setting
+DEFAULT_LANDMARKS  = 8
+
+def dijkstra_distances(occ, rows, cols, source, parent=None):
+    """
+    Exact 8-directional distances from `source` to every cell, as a flat
+    array('d') indexed r*cols + c; unreachable cells and walls hold inf.
+    If `parent` (an array('i') of rows*cols) is given, it receives each
+    reached cell's predecessor index — a shortest-path tree.
+    """
+    inf  = math.inf
+    dist = array("d", [inf]) * (rows * cols)
+    s    = source[0]*cols + source[1]
+    dist[s] = 0.0
+    heap = [(0.0, s)]
+    steps = [(dr, dc, move_cost(dr, dc)) for dr, dc in MOVES]
+
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > dist[i]: continue
+        r, c = divmod(i, cols)
+        for dr, dc, w in steps:
+            nr, nc = r+dr, c+dc
+            if not (0 <= nr < rows and 0 <= nc < cols): continue
+            j = nr*cols + nc
+            if occ[j]: continue
+            nd = d + w
+            if nd < dist[j]:
+                dist[j] = nd
+                if parent is not None: parent[j] = i
+                heapq.heappush(heap, (nd, j))
+    return dist
+
+
+class LandmarkTable:
+    """
+    Precomputed exact distances from K landmarks, picked by farthest-point
+    selection.  By the triangle inequality |d(L,t) - d(L,n)| <= d(n,t) for
+    every landmark L, so the max over landmarks is an admissible heuristic
+    that — unlike the geometric ones — sees walls.
+
+    Adding walls only lengthens true distances, so a table stays admissible
+    until a wall is removed; `epoch` lets callers track that.
+    """
+    def __init__(self, occ, rows, cols, k=DEFAULT_LANDMARKS, epoch=0, grid_hash=None):
+        t0 = time.perf_counter()
+        self.rows, self.cols = rows, cols
+        self.epoch     = epoch
+        self.grid_hash = grid_hash
+        self.landmarks = []
+        self.tables    = []
+
+        free = [i for i in range(rows * cols) if not occ[i]]
+        if free:
+            # Seed with the cell farthest from an arbitrary free cell, then
+            # keep adding the cell farthest from every landmark chosen so far.
+            seed = dijkstra_distances(occ, rows, cols, divmod(free[0], cols))
+            nearest = array("d", seed)
+            for _ in range(min(k, len(free))):
+                best = max(free, key=lambda i: nearest[i] if nearest[i] < math.inf else -1.0)
+                if best in self.landmarks: break
+                table = dijkstra_distances(occ, rows, cols, divmod(best, cols))
+                self.landmarks.append(best)
+                self.tables.append(table)
+                for i in free:
+                    if table[i] < nearest[i] or len(self.tables) == 1:
+                        nearest[i] = table[i]
+        self.build_ms = (time.perf_counter() - t0) * 1000
+
+    def __len__(self): return len(self.landmarks)
+
+    def heuristic(self, target):
+        """Return h(r, c, gr, gc) for a fixed target, usable by search_grid."""
+        cols = self.cols
+        t    = target[0]*cols + target[1]
+        inf  = math.inf
+        rows_t = [(tbl[t], tbl) for tbl in self.tables]
+        diag   = DIAGONAL_COST - 1
+
+        def h_alt(r, c, gr, gc):
+            dx = abs(r - gr);  dy = abs(c - gc)
+            best = max(dx, dy) + diag * min(dx, dy)
+            i = r*cols + c
+            for dt, tbl in rows_t:
+                dn = tbl[i]
+                if dn == inf or dt == inf:
+                    if dn != dt: return inf      # different components
+                    continue
+                lb = dt - dn if dt > dn else dn - dt
+                if lb > best: best = lb
+            return best
+        return h_alt
+
+
+# ─────────────────────────────────────────────
+#  MULTI-WAYPOINT TOURS
+# ─────────────────────────────────────────────
+class TourPlanner:
+    """
+    Orders visits to several stops.  One Dijkstra per stop yields a whole
+    row of the pairwise distance matrix plus a shortest-path tree for the
+    legs out of it — no per-pair searches.  Trees are cached per stop and
+    kept in step with wall edits through set_cell:
+
+      * a removed wall can shorten any leg, so every tree is dropped;
+      * an added wall drops only the trees with a leg through that cell.
+        The other legs keep their exact cost, but the rest of such a tree
+        may now be stale, so it is trusted for the current stops only.
+    """
+    def __init__(self, occ, rows, cols):
+        self.occ   = bytearray(occ)
+        self.rows, self.cols = rows, cols
+        self.trees   = {}        # stop index -> [dist, parent, legs, trusted]
+        self.stops   = ()
+        self.version = 0         # bumped on every wall change
+        self.builds  = 0         # Dijkstra runs
+        self.expanded = 0        # cells settled by those runs
+        self._matrix = None      # (stops, version, matrix)
+
+    def set_cell(self, r, c, wall):
+        i = r*self.cols + c
+        if bool(self.occ[i]) == bool(wall): return
+        self.occ[i] = 1 if wall else 0
+        self.version += 1
+        if not wall:
+            self.trees.clear()
+            return
+        for src, tree in list(self.trees.items()):
+            if i in tree[2]:
+                del self.trees[src]
+            elif tree[0][i] < math.inf:
+                tree[3] = set(self.stops)     # exact only for these stops now
+
+    def _legs(self, src, parent):
+        """Cells on the tree's legs from `src` to the current stops."""
+        cells = set()
+        for t in self.stops:
+            while t != src and t not in cells and parent[t] >= 0:
+                cells.add(t)
+                t = parent[t]
+        return cells
+
+    def set_stops(self, stops):
+        """Make `stops` ((r, c) cells) current, building only missing trees."""
+        self.stops = tuple(r*self.cols + c for r, c in stops)
+        wanted = set(self.stops)
+        for src in list(self.trees):
+            if src not in wanted: del self.trees[src]
+        for src in self.stops:
+            tree = self.trees.get(src)
+            if tree is not None and (tree[3] is None or wanted <= tree[3]):
+                tree[2] = self._legs(src, tree[1])
+                continue
+            parent = array("i", [-1]) * (self.rows * self.cols)
+            dist = dijkstra_distances(self.occ, self.rows, self.cols,
+                                      divmod(src, self.cols), parent)
+            self.builds   += 1
+            self.expanded += sum(1 for d in dist if d < math.inf)
+            self.trees[src] = [dist, parent, self._legs(src, parent), None]
+
+    def matrix(self):
+        """Pairwise distances between the current stops (cached per grid version)."""
+        key = (self.stops, self.version)
+        if self._matrix is None or self._matrix[:2] != key:
+            m = [[self.trees[s][0][t] for t in self.stops] for s in self.stops]
+            self._matrix = key + (m,)
+        return self._matrix[2]
+
+    def leg(self, a, b):
+        """Cell path from stop `a` to stop `b` (both (r, c)), or [] if unreachable."""
+        src, t = a[0]*self.cols + a[1], b[0]*self.cols + b[1]
+        dist, parent = self.trees[src][:2]
+        if dist[t] == math.inf: return []
+        cells = [t]
+        while t != src:
+            t = parent[t]
+            cells.append(t)
+        return [divmod(i, self.cols) for i in reversed(cells)]
+
+    def plan(self, start, goals, end=None):
+        """
+        Visit order start → every goal → end (if given).  Returns
+        (ordered stops, tour cost, goals unreachable from start).
+        """
+        stops = [start] + list(goals) + ([end] if end else [])
+        self.set_stops(stops)
+        dist = self.matrix()
+        unreachable = [stops[k] for k in range(1, len(stops)) if dist[0][k] == math.inf]
+        if unreachable:
+            return [], math.inf, unreachable
+        order = order_tour(dist, end_fixed=end is not None)
+        return [stops[k] for k in order], tour_cost(dist, order), []
+
+    def route(self, order):
+        """Concatenate the legs of an ordered tour into one cell path."""
+        cells = [order[0]]
+        for a, b in zip(order, order[1:]):
+            cells += self.leg(a, b)[1:]
+        return cells
+
+
+def tour_cost(dist, order):
+    return sum(dist[a][b] for a, b in zip(order, order[1:]))
+
+def order_tour(dist, end_fixed=True):
+    """
+    Visit order over matrix indices starting at 0 (and ending at n-1 when
+    end_fixed): nearest neighbour, then 2-opt segment reversals until no
+    reversal shortens the tour.  Distances are symmetric on this grid.
+    """
+    n = len(dist)
+    if n <= 2: return list(range(n))
+    inner = set(range(1, n-1 if end_fixed else n))
+    order = [0]
+    while inner:
+        nxt = min(inner, key=lambda k: dist[order[-1]][k])
+        order.append(nxt)
+        inner.discard(nxt)
+    if end_fixed: order.append(n-1)
+
+    last = len(order) - 1 if end_fixed else len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last - 1):
+            for j in range(i + 1, last):
+                a, b = order[i-1], order[i]
+                c = order[j]
+                d = order[j+1] if j + 1 < len(order) else None
+                before = dist[a][b] + (dist[c][d] if d is not None else 0.0)
+                after  = dist[a][c] + (dist[b][d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:j+1] = reversed(order[i:j+1])
+                    improved = True
+    return order
+
+
+# ─────────────────────────────────────────────
+#  PARALLEL BATCH PLANNING
+# ─────────────────────────────────────────────
+_BATCH_WORKER = {}   # per-process state, filled by _batch_worker_init
+
+def _batch_worker_init(shm_name, rows, cols, algo, heuristic, diagonal=True):
+    """Attach to the parent's shared occupancy grid once per worker."""
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    landmarks = (LandmarkTable(shm.buf, rows, cols)
+                 if heuristic == ALT_HEURISTIC else None)
+    _BATCH_WORKER.update(shm=shm, occ=shm.buf, rows=rows, cols=cols,
+                         algo=algo, heuristic=heuristic, landmarks=landmarks,
+                         diagonal=diagonal)
+
+def _batch_worker_query(query):
+    w = _BATCH_WORKER
+    start, target = tuple(query[0]), tuple(query[1])
+    path, expanded = find_path(w["occ"], w["rows"], w["cols"],
+                               start, target, w["algo"], w["heuristic"],
+                               landmarks=w["landmarks"], diagonal=w["diagonal"])
+    return {"start": start, "target": target, "found": bool(path),
+            "path": path, "cost": path_cost(path), "expanded": expanded}
+
+def plan_batch(grid, queries, algo="A*", heuristic="Manhattan",
+               workers=None, chunksize=None, diagonal=True):
+    """
+    Plan many (start, target) queries on one map across a process pool.
+    The occupancy grid is copied once into multiprocessing.shared_memory;
+    workers attach to it by name so nothing but the queries and results
+    is pickled.  Results come back in query order.  `diagonal` is passed
+    to find_path (wavefront only).
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    queries = list(queries)
+    rows, cols = len(grid), len(grid[0])
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(queries) // (workers * 4))
+
+    shm = shared_memory.SharedMemory(create=True, size=rows * cols)
+    try:
+        shm.buf[:rows * cols] = occupancy_from_grid(grid)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_batch_worker_init,
+                                 initargs=(shm.name, rows, cols, algo, heuristic,
+                                           diagonal)) as ex:
+            return list(ex.map(_batch_worker_query, queries, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# ─────────────────────────────────────────────
+#  MONTE CARLO EPISODE SIMULATOR
+# ─────────────────────────────────────────────
+# When a spawned wall triggers a re-plan:
+#   "on-path"     — it lands anywhere on the current path (what the GUI does)
+#   "on-block"    — it lands on the part of the path still ahead of the agent
+#   "every-spawn" — any spawn at all
+REPLAN_STRATEGIES = ("on-path", "on-block", "every-spawn")
+
+def _percentile(sorted_vals, q):
+    """Nearest-rank percentile of an already sorted list (0 <= q <= 100)."""
+    if not sorted_vals: return 0.0
+    k = max(0, math.ceil(q / 100.0 * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+def run_episode(seed, rows=DEFAULT_ROWS, cols=DEFAULT_COLS, density=0.28,
+                spawn_prob=0.12, algo="A*", heuristic="Manhattan",
+                strategy="on-path", max_steps=None, diagonal=True):
+    """
+    One seeded, headless run of _start_search + _animate_agent: random map,
+    initial plan, then the agent walks while walls spawn and it re-plans.
+    Outcome is "reached", "no-path" (nothing at the start), "stuck"
+    (a re-plan failed) or "timeout" (max_steps exceeded).  `diagonal` is
+    passed to find_path (wavefront only).
+    """
+    if strategy not in REPLAN_STRATEGIES:
+        raise ValueError(f"unknown replanning strategy: {strategy!r}")
+    rng    = random.Random(seed)
+    start  = (1, 1)
+    target = (rows-2, cols-2)
+    fixed  = {start[0]*cols + start[1], target[0]*cols + target[1]}
+
+    occ = bytearray(rows * cols)
+    for i in range(rows * cols):
+        if i not in fixed and rng.random() < density:
+            occ[i] = 1
+
+    result = {"seed": seed, "outcome": "reached", "replans": 0,
+              "expanded": 0, "steps": 0, "latencies_ms": []}
+
+    # Spawns only add walls, so one landmark table stays admissible all episode
+    landmarks = (LandmarkTable(occ, rows, cols)
+                 if heuristic == ALT_HEURISTIC else None)
+    # Lazy Theta* shares one LOS cache over the episode's own buffer
+    los = LineOfSightCache(occ, rows, cols) if algo == THETA_ALGO else None
+    walk = densify if algo == THETA_ALGO else list
+
+    path, expanded = find_path(occ, rows, cols, start, target, algo, heuristic,
+                               landmarks, los=los, diagonal=diagonal)
+    path = walk(path)
+    result["expanded"] = expanded
+    if not path:
+        result["outcome"] = "no-path"
+        return result
+
+    max_steps = max_steps or rows * cols * 4
+    idx = 0
+    while idx < len(path)-1:
+        if result["steps"] >= max_steps:
+            result["outcome"] = "timeout"
+            return result
+        r, c = path[idx]
+        result["steps"] += 1
+
+        if rng.random() <= spawn_prob:
+            agent = r*cols + c
+            candidates = [i for i in range(rows * cols)
+                          if not occ[i] and i not in fixed and i != agent]
+            if candidates:
+                cell = rng.choice(candidates)
+                hit = divmod(cell, cols)
+                occ[cell] = 1
+                if los is not None: los.invalidate(*hit)
+                if strategy == "every-spawn":
+                    replan = True
+                elif strategy == "on-block":
+                    replan = hit in path[idx+1:]
+                else:
+                    replan = hit in path
+
+                if replan:
+                    t0 = time.perf_counter()
+                    path, expanded = find_path(occ, rows, cols, (r, c), target,
+                                               algo, heuristic, landmarks, los=los,
+                                               diagonal=diagonal)
+                    path = walk(path)
+                    result["latencies_ms"].append((time.perf_counter()-t0)*1000)
+                    result["replans"]  += 1
+                    result["expanded"] += expanded
+                    if not path:
+                        result["outcome"] = "stuck"
+                        return result
+                    idx = 0
+                    continue
+
+        idx += 1
+    return result
+
+def simulate_episodes(episodes=1000, seed=0, workers=None, **params):
+    """
+    Run `episodes` seeded episodes (seeds seed .. seed+episodes-1) across a
+    process pool and aggregate them.  `params` are passed to run_episode.
+    Returns success rate, outcome counts, re-plans per episode, total
+    expansions and p50/p95/p99 re-plan latency in milliseconds.
+    """
+    import os
+    from collections import Counter
+    from functools import partial
+
+    workers = workers or os.cpu_count() or 1
+    seeds   = range(seed, seed + episodes)
+    job     = partial(run_episode, **params)
+    if workers == 1:
+        results = [job(s) for s in seeds]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(job, seeds,
+                                  chunksize=max(1, episodes // (workers * 8))))
+
+    outcomes  = Counter(res["outcome"] for res in results)
+    replans   = [res["replans"] for res in results]
+    latencies = sorted(l for res in results for l in res["latencies_ms"])
+    n = max(1, len(results))
+    return {
+        "episodes":            len(results),
+        "params":              dict(params, seed=seed),
+        "success_rate":        outcomes["reached"] / n,
+        "outcomes":            dict(outcomes),
+        "replans_per_episode": sum(replans) / n,
+        "replans_max":         max(replans, default=0),
+        "total_expansions":    sum(res["expanded"] for res in results),
+        "replan_latency_ms": {
+            "count": len(latencies),
+            "p50":   _percentile(latencies, 50),
+            "p95":   _percentile(latencies, 95),
+            "p99":   _percentile(latencies, 99),
+            "max":   latencies[-1] if latencies else 0.0,
+        },
+    }
+
+
+# ─────────────────────────────────────────────
+#  ZOBRIST GRID HASH + SEARCH RESULT CACHE
+# ─────────────────────────────────────────────
+DEFAULT_CACHE_SIZE = 64
+
+class ZobristHash:
+    """
+    Incremental 64-bit hash of the wall layout.  Every cell owns a random
+    key; the hash is the XOR of the keys of all wall cells, so toggling a
+    wall is a single O(1) XOR.
+    """
+    def __init__(self, rows, cols, seed=0x5EED):
+        rng = random.Random(seed)
+        self.cols  = cols
+        self.keys  = [rng.getrandbits(64) for _ in range(rows * cols)]
+        self.value = 0
+
+    def toggle(self, r, c):
+        self.value ^= self.keys[r*self.cols + c]
+
+    def reset(self, occ=()):
+        """Recompute from scratch for a flat occupancy buffer."""
+        self.value = 0
+        for i, wall in enumerate(occ):
+            if wall: self.value ^= self.keys[i]
+
+
+class SearchCache:
+    """
+    LRU cache of search results keyed by
+    (grid hash, rows, cols, start, target, algorithm, heuristic).
+    A maxsize of 0 disables caching.
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        from collections import OrderedDict
+        self.maxsize   = maxsize
+        self.entries   = OrderedDict()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def __len__(self): return len(self.entries)
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0: return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self._evict()
+
+    def resize(self, maxsize):
+        self.maxsize = max(0, maxsize)
+        self._evict()
+
+    def clear(self):
+        self.entries.clear()
+
+    def _evict(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+# ─────────────────────────────────────────────
+#  SEARCH TRACE RECORDING
+# ─────────────────────────────────────────────
+TRACE_EXPAND = 0      # node taken off the open list (closed)
+TRACE_PUSH   = 1      # node pushed onto the open list (frontier)
+TRACE_LAYER  = 2      # end of a wavefront layer: replay paints it as one frame
+TRACE_MAGIC  = b"PFTRACE1"
+
+class SearchTrace:
+    """
+    Compact record of a search: one uint32 per event, packed as
+    (cell index << 2) | event type.  Pass trace.expand / trace.push as
+    search_grid's on_expand / on_push callbacks, then replay it at leisure.
+    Wavefront searches record through trace.layer instead: the layer's
+    cells as expansions followed by a TRACE_LAYER marker.
+
+    Binary format (little-endian): 8-byte magic, then rows, cols and event
+    count as uint32, then the packed events.
+    """
+    def __init__(self, rows, cols, events=None):
+        self.rows, self.cols = rows, cols
+        self.events = events if events is not None else array("I")
+        self.layered = any(v & 3 == TRACE_LAYER for v in self.events)
+
+    def __len__(self): return len(self.events)
+
+    def __getitem__(self, i):
+        """Event i as (type, r, c)."""
+        v = self.events[i]
+        r, c = divmod(v >> 2, self.cols)
+        return v & 3, r, c
+
+    def expand(self, r, c):
+        self.events.append(((r*self.cols + c) << 2) | TRACE_EXPAND)
+
+    def push(self, r, c):
+        self.events.append(((r*self.cols + c) << 2) | TRACE_PUSH)
+
+    def layer(self, cells):
+        """Record one wavefront layer (flat r*cols + c indices) as a single frame."""
+        if hasattr(cells, "astype"):            # NumPy array: pack without a Python loop
+            self.events.frombytes((cells.astype("uint32") << 2).tobytes())
+        else:
+            self.events.extend((i << 2) | TRACE_EXPAND for i in cells)
+        self.events.append(TRACE_LAYER)
+        self.layered = True
+
+    def save(self, fname):
+        import struct, sys
+        events = self.events
+        if sys.byteorder != "little":
+            events = array("I", events);  events.byteswap()
+        with open(fname, "wb") as f:
+            f.write(TRACE_MAGIC + struct.pack("<III", self.rows, self.cols, len(events)))
+            events.tofile(f)
+
+    @classmethod
+    def load(cls, fname):
+        import struct, sys
+        with open(fname, "rb") as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise ValueError(f"{fname}: not a search trace")
+            rows, cols, n = struct.unpack("<III", f.read(12))
+            events = array("I")
+            events.fromfile(f, n)
+        if sys.byteorder != "little":
+            events.byteswap()
+        return cls(rows, cols, events)
+
+
+# ─────────────────────────────────────────────
+#  HOT-PATH INSTRUMENTATION
+# ─────────────────────────────────────────────
+class SearchStats:
+    """
+    Per-phase call counts and wall-clock seconds for one run.  search_grid
+    fills heap / neighbors / heuristic / search; the GUI adds render and
+    sleep while replaying the recorded trace.  "search" is the whole
+    search_grid call, including any time spent in its callbacks.
+    """
+    PHASES = ("search", "heap", "neighbors", "heuristic", "render", "sleep")
+
+    def __init__(self):
+        self.counts      = dict.fromkeys(self.PHASES, 0)
+        self.seconds     = dict.fromkeys(self.PHASES, 0.0)
+        self.heap_pushes = 0
+        self.heap_pops   = 0
+        self.heap_peak   = 0
+        self.repushes    = 0
+        self.expanded    = 0
+        self.profile     = {}   # filled by profile_call
+
+    def add(self, phase, seconds, n=1):
+        self.counts[phase]  += n
+        self.seconds[phase] += seconds
+
+    def nested_seconds(self):
+        s = self.seconds
+        return s["heap"] + s["heuristic"] + s["render"] + s["sleep"]
+
+    def search_ms(self):
+        return self.seconds["search"] * 1000
+
+    def instrument(self, h_fn, push, pop):
+        """Wrap a heuristic and heap push/pop with counting timers."""
+        clock   = time.perf_counter
+        seconds = self.seconds
+        counts  = self.counts
+
+        def h_timed(r, c, gr, gc):
+            t = clock();  v = h_fn(r, c, gr, gc)
+            seconds["heuristic"] += clock() - t;  counts["heuristic"] += 1
+            return v
+
+        def push_timed(heap, item):
+            t = clock();  push(heap, item)
+            seconds["heap"] += clock() - t;  counts["heap"] += 1
+            self.heap_pushes += 1
+            if len(heap) > self.heap_peak: self.heap_peak = len(heap)
+
+        def pop_timed(heap):
+            t = clock();  item = pop(heap)
+            seconds["heap"] += clock() - t;  counts["heap"] += 1
+            self.heap_pops += 1
+            return item
+
+        return h_timed, push_timed, pop_timed
+
+    def as_dict(self):
+        return {
+            "phases": {p: {"count": self.counts[p],
+                           "ms": round(self.seconds[p] * 1000, 3)}
+                       for p in self.PHASES},
+            "search_ms":   round(self.search_ms(), 3),
+            "expanded":    self.expanded,
+            "heap_pushes": self.heap_pushes,
+            "heap_pops":   self.heap_pops,
+            "heap_peak":   self.heap_peak,
+            "repushes":    self.repushes,
+            "profile":     self.profile,
+        }
+
+
+def profile_call(stats, fn, *args, **kwargs):
+    """
+    Run fn under cProfile and tracemalloc (opt-in: both slow it down) and
+    store the top functions by cumulative time plus the traced memory
+    peak in stats.profile.
+    """
+    import cProfile, io, pstats, tracemalloc
+    prof = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        return prof.runcall(fn, *args, **kwargs)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(25)
+        stats.profile = {"tracemalloc_peak_kb": round(peak / 1024, 1),
+                         "cprofile": out.getvalue()}
+
+
+# ─────────────────────────────────────────────
+#  MULTI-AGENT COOPERATIVE PLANNING
+# ─────────────────────────────────────────────
+DEFAULT_RESERVATION_WINDOW = 16
+WAIT_COST = 1.0
+
+class ReservationTable:
+    """
+    Hash-backed space-time reservation table for cooperative A*.
+    A cell is claimed per tick — (t, cell) -> agent — and each move also
+    claims its edge so two agents cannot swap cells.  An agent that has
+    arrived parks on its goal, which blocks the cell from then on.
+    Entries are bucketed by tick so advance() drops the past cheaply.
+    """
+    def __init__(self):
+        self.cells   = {}     # (t, cell) -> agent id
+        self.edges   = {}     # (t, a, b) -> agent id: moves a -> b during t -> t+1
+        self.parked  = {}     # cell -> (agent id, from tick)
+        self.by_tick = {}     # t -> list of keys, for advance()
+        self.busy    = {}     # cell -> {t: agent id}, for goal checks
+
+    def reserve(self, agent, cells, t0):
+        """
+        Claim `cells` (one per tick from t0).  Claims already held by another
+        agent are kept — that happens beyond the planning window — so the
+        newcomer sees the conflict when it gets close and re-plans.
+        """
+        for k, cell in enumerate(cells):
+            t = t0 + k
+            if self.cells.setdefault((t, cell), agent) == agent:
+                self.busy.setdefault(cell, {})[t] = agent
+                self.by_tick.setdefault(t, []).append((t, cell))
+            if k + 1 < len(cells):
+                edge = (t, cell, cells[k+1])
+                if self.edges.setdefault(edge, agent) == agent:
+                    self.by_tick.setdefault(t, []).append(edge)
+        if cells:
+            self.parked.setdefault(cells[-1], (agent, t0 + len(cells) - 1))
+
+    def release(self, agent, cells, t0):
+        for k, cell in enumerate(cells):
+            t = t0 + k
+            if self.cells.get((t, cell)) == agent:
+                del self.cells[(t, cell)]
+                self.busy[cell].pop(t, None)
+            if k + 1 < len(cells) and self.edges.get((t, cell, cells[k+1])) == agent:
+                del self.edges[(t, cell, cells[k+1])]
+        if cells and self.parked.get(cells[-1], (None,))[0] == agent:
+            del self.parked[cells[-1]]
+
+    def advance(self, now):
+        """Forget every reservation for ticks before `now`."""
+        for t in [t for t in self.by_tick if t < now]:
+            for key in self.by_tick.pop(t):
+                owner = self.cells.pop(key, None) if len(key) == 2 else self.edges.pop(key, None)
+                if len(key) == 2 and owner is not None:
+                    self.busy[key[1]].pop(t, None)
+
+    def owner(self, cell, t):
+        """Agent holding `cell` at tick t (a parked agent holds it forever)."""
+        park = self.parked.get(cell)
+        if park is not None and t >= park[1]: return park[0]
+        return self.cells.get((t, cell))
+
+    def can_enter(self, agent, a, b, t):
+        """May `agent` move a -> b during t -> t+1?"""
+        other = self.owner(b, t+1)
+        if other is not None and other != agent: return False
+        other = self.edges.get((t, b, a))
+        return other is None or other == agent
+
+    def last_claim(self, cell, agent):
+        """Latest tick at which another agent has claimed `cell`, or -1."""
+        ticks = [t for t, a in self.busy.get(cell, {}).items() if a != agent]
+        return max(ticks, default=-1)
+
+
+class CoopAgent:
+    """One agent of a cooperative plan; `plan` holds a cell index per tick from t0."""
+    def __init__(self, aid, start, target):
+        self.id      = aid
+        self.start   = start
+        self.target  = target
+        self.plan    = []
+        self.t0      = 0
+        self.replans = 0
+        self.stuck   = False
+
+    def cell_at(self, t):
+        if not self.plan: return None
+        return self.plan[min(max(t - self.t0, 0), len(self.plan) - 1)]
+
+
+class CooperativePlanner:
+    """
+    Windowed cooperative A* (WHCA*) over a shared ReservationTable.
+    Agents are planned one at a time in (cell, tick) space: within
+    `window` ticks of now the search honours reservations and may wait
+    in place; beyond it, it falls back to plain spatial A*.  Each agent's
+    search is bounded by the window, so adding an agent costs roughly the
+    same however many are already planned.
+
+    Agents re-plan only when affected: a wall lands on their remaining
+    plan, or their next step collides with another agent's reservation.
+    """
+    def __init__(self, occ, rows, cols, heuristic="Octile",
+                 window=DEFAULT_RESERVATION_WINDOW):
+        self.occ    = bytearray(occ)
+        self.rows   = rows
+        self.cols   = cols
+        self.h_fn   = HEURISTICS[heuristic]
+        self.window = window
+        self.table  = ReservationTable()
+        self.agents = []
+        self.now    = 0
+        self.plan_ms  = []      # one entry per (re)plan
+        self.expanded = 0
+
+    # ── planning ──────────────────────────────
+    def add_agent(self, start, target):
+        agent = CoopAgent(len(self.agents), start, target)
+        self.agents.append(agent)
+        self._plan(agent, start[0]*self.cols + start[1])
+        return agent
+
+    def _plan(self, agent, from_cell):
+        if agent.plan:
+            self.table.release(agent.id, agent.plan, agent.t0)
+        t0 = time.perf_counter()
+        cells = self._search(agent.id, from_cell, agent.target, self.now)
+        self.plan_ms.append((time.perf_counter() - t0) * 1000)
+        agent.stuck = cells is None
+        agent.plan  = cells or [from_cell]
+        agent.t0    = self.now
+        self.table.reserve(agent.id, agent.plan, self.now)
+
+    def _search(self, aid, src, target, t0):
+        rows, cols, occ, table = self.rows, self.cols, self.occ, self.table
+        gr, gc = target
+        goal   = gr*cols + gc
+        h_fn   = self.h_fn
+        t_end  = t0 + self.window
+        if occ[goal]: return None
+        settle = table.last_claim(goal, aid)
+
+        r0, c0  = divmod(src, cols)
+        counter = 0
+        heap    = [(h_fn(r0, c0, gr, gc), 0.0, counter, src, t0)]
+        parent  = {(src, t0): None}
+        best_g  = {(src, t0): 0.0}
+        limit   = rows * cols * 4
+
+        while heap and limit:
+            _, g, _, cell, t = heapq.heappop(heap)
+            key = (cell, t if t < t_end else None)
+            if g > best_g.get(key, math.inf): continue
+            limit -= 1
+            self.expanded += 1
+
+            if cell == goal and (t >= t_end or t > settle):
+                out = []
+                k = key
+                while k is not None:
+                    out.append(k[0])
+                    k = parent[k]
+                out.reverse()
+                return out
+
+            r, c  = divmod(cell, cols)
+            moves = [(0, 0, WAIT_COST)] if t < t_end else []
+            moves += [(dr, dc, move_cost(dr, dc)) for dr, dc in MOVES]
+            for dr, dc, w in moves:
+                nr, nc = r+dr, c+dc
+                if not (0 <= nr < rows and 0 <= nc < cols): continue
+                nxt = nr*cols + nc
+                if occ[nxt]: continue
+                if t < t_end and not table.can_enter(aid, cell, nxt, t): continue
+                nt   = t + 1
+                nkey = (nxt, nt if nt < t_end else None)
+                ng   = g + w
+                if ng < best_g.get(nkey, math.inf):
+                    best_g[nkey] = ng
+                    parent[nkey] = key
+                    counter += 1
+                    heapq.heappush(heap, (ng + h_fn(nr, nc, gr, gc), ng, counter, nxt, nt))
+        return None
+
+    # ── execution ─────────────────────────────
+    def add_wall(self, r, c):
+        """A wall appeared: re-plan only agents whose remaining plan crosses it."""
+        cell = r*self.cols + c
+        self.occ[cell] = 1
+        replanned = []
+        for a in self.agents:
+            if self.done(a): continue
+            if cell in a.plan[max(self.now - a.t0, 0):]:
+                a.replans += 1
+                self._plan(a, a.cell_at(self.now))
+                replanned.append(a)
+        return replanned
+
+    def done(self, agent):
+        return agent.cell_at(self.now) == agent.target[0]*self.cols + agent.target[1]
+
+    def step(self):
+        """
+        Advance one tick.  Agents whose next step is now blocked by a
+        reservation conflict (or who are stuck) re-plan first.
+        Returns the list of agents that re-planned this tick.
+        """
+        now = self.now
+        replanned = []
+        for a in self.agents:
+            if self.done(a): continue
+            cur, nxt = a.cell_at(now), a.cell_at(now + 1)
+            if a.stuck or not self.table.can_enter(a.id, cur, nxt, now):
+                a.replans += 1
+                self._plan(a, cur)
+                replanned.append(a)
+        self.now += 1
+        self.table.advance(self.now)
+        return replanned
+
+    def positions(self):
+        return [divmod(a.cell_at(self.now), self.cols) for a in self.agents]
+
+    def all_done(self):
+        return all(self.done(a) for a in self.agents)
+
+
+# ─────────────────────────────────────────────
+#  MAP FILES
+# ─────────────────────────────────────────────
+# Plain text, one line per row:  '#' wall, '.' free, 'S' start, 'T' target.
+# Lines are padded to the longest with free cells.
+MAP_WALLS = set("#@X1")
+
+def parse_map(text):
+    """Parse map text into (grid with -1 walls, start or None, target or None)."""
+    lines = [ln.rstrip("\r\n") for ln in text.splitlines()]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        raise ValueError("map is empty")
+    cols = max(len(ln) for ln in lines)
+    grid, start, target = [], None, None
+    for r, ln in enumerate(lines):
+        row = []
+        for c, ch in enumerate(ln.ljust(cols, ".")):
+            row.append(-1 if ch in MAP_WALLS else 0)
+            if ch == "S": start  = (r, c)
+            if ch == "T": target = (r, c)
+        grid.append(row)
+    return grid, start, target
+
+def load_map(fname):
+    with open(fname, encoding="utf-8") as f:
+        return parse_map(f.read())
+
+def format_map(grid, start=None, target=None):
+    out = []
+    for r, row in enumerate(grid):
+        line = []
+        for c, v in enumerate(row):
+            if   (r, c) == start:  line.append("S")
+            elif (r, c) == target: line.append("T")
+            else:                  line.append("#" if v == -1 else ".")
+        out.append("".join(line))
+    return "\n".join(out) + "\n"
+
+
+# ─────────────────────────────────────────────
+#  PLANNING SERVICE (asyncio, JSON lines)
+# ─────────────────────────────────────────────
+# One JSON object per line in each direction; an optional "id" is echoed.
+#   {"op": "load",      "map": name, "text": "#..S\n..." | "file": path}
+#   {"op": "query",     "map": name, "start": [r,c], "target": [r,c],
+#                       "algo": "astar", "heuristic": "octile"}
+#   {"op": "set_walls", "map": name, "add": [[r,c], ...], "remove": [...]}
+#   {"op": "stats"}
+#   {"op": "unload",    "map": name}
+# Replies carry "ok": true, or "ok": false with an "error" message.
+DEFAULT_SERVICE_PORT = 8765
+_SERVICE_LINE_LIMIT  = 1 << 24           # a 4000x4000 map fits on one line
+
+_SERVICE_LANDMARKS = {}     # in each worker process: (map id, erase epoch) -> LandmarkTable
+
+def _service_search(map_id, occ, rows, cols, epoch, start, target, algo, heuristic,
+                    diagonal=True):
+    """
+    PlanningService job, run in a worker process on an occupancy snapshot.
+    ALT tables are built here, once per map and erase epoch, and kept in
+    the worker rather than pickled with every query.
+    """
+    t0 = time.perf_counter()
+    landmarks = None
+    if heuristic == ALT_HEURISTIC and algo not in NO_HEURISTIC_ALGOS:
+        key = (map_id, epoch)
+        landmarks = _SERVICE_LANDMARKS.get(key)
+        if landmarks is None:
+            while len(_SERVICE_LANDMARKS) >= 4:
+                del _SERVICE_LANDMARKS[next(iter(_SERVICE_LANDMARKS))]
+            landmarks = _SERVICE_LANDMARKS[key] = LandmarkTable(occ, rows, cols,
+                                                                epoch=epoch)
+    route, expanded = find_path(occ, rows, cols, start, target, algo, heuristic,
+                                landmarks, diagonal=diagonal)
+    return route, expanded, (time.perf_counter() - t0) * 1000
+
+
+class MapSession:
+    """
+    A map held by the service: flat occupancy, Zobrist hash and result
+    cache.  Queries search a bytes snapshot of `occ`, so wall updates never
+    race a running search; `id` is unique per load, so worker-side ALT
+    tables never outlive a reloaded map.
+    """
+    _next_id = 0
+
+    def __init__(self, grid, cache_size=DEFAULT_CACHE_SIZE):
+        MapSession._next_id += 1
+        self.id = MapSession._next_id
+        self.rows, self.cols = len(grid), len(grid[0])
+        self.occ     = occupancy_from_grid(grid)
+        self.zobrist = ZobristHash(self.rows, self.cols)
+        self.zobrist.reset(self.occ)
+        self.cache   = SearchCache(cache_size)
+        self.erase_epoch = 0
+
+    def check_cell(self, cell):
+        r, c = cell
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            raise ValueError(f"cell {r},{c} is outside the {self.rows}x{self.cols} map")
+        return r, c
+
+    def set_walls(self, add=(), remove=()):
+        """Apply wall edits; returns how many cells actually changed."""
+        changed = 0
+        for cells, wall in ((add, 1), (remove, 0)):
+            for cell in cells:
+                r, c = self.check_cell(cell)
+                i = r*self.cols + c
+                if self.occ[i] != wall:
+                    self.occ[i] = wall
+                    self.zobrist.toggle(r, c)
+                    changed += 1
+                    if not wall:
+                        self.erase_epoch += 1    # landmarks no longer admissible
+        return changed
+
+
+class PlanningService:
+    """
+    Holds named MapSessions and answers JSON-line requests.  Searches run
+    in a process pool, so queries on different keys use separate cores
+    instead of taking turns on the GIL; identical queries arriving while
+    one is in flight await the same future instead of searching again,
+    and finished results land in the map's SearchCache under its current
+    Zobrist hash.  `diagonal` is the wavefront's default connectivity; a
+    query's "connectivity" field (4 or 8) overrides it.
+    """
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE, diagonal=True):
+        self.maps       = {}
+        self.cache_size = cache_size
+        self.diagonal   = diagonal
+        self.workers    = workers
+        self.executor   = self._new_executor()
+        self.inflight   = {}         # (map, cache key) -> asyncio future
+        self.queries    = 0
+        self.searches   = 0
+        self.coalesced  = 0
+
+    def _new_executor(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def _session(self, req):
+        name = req.get("map", "default")
+        if name not in self.maps:
+            raise ValueError(f"unknown map {name!r}")
+        return name, self.maps[name]
+
+    async def handle(self, req):
+        """Dispatch one decoded request and return the reply dict."""
+        op = req.get("op")
+        try:
+            if op == "load":
+                # An int "file" would make open() adopt one of our own fds.
+                field = "file" if "file" in req else "text"
+                if not isinstance(req[field], str):
+                    raise TypeError(f"{field!r} must be a string")
+                if field == "file": grid, _, _ = load_map(req["file"])
+                else:               grid, _, _ = parse_map(req["text"])
+                name = req.get("map", "default")
+                self.maps[name] = MapSession(grid, self.cache_size)
+                out = {"map": name, "rows": len(grid), "cols": len(grid[0])}
+            elif op == "query":
+                out = await self._query(req)
+            elif op == "set_walls":
+                _, sess = self._session(req)
+                out = {"changed": sess.set_walls(req.get("add", ()), req.get("remove", ())),
+                       "hash": sess.zobrist.value}
+            elif op == "stats":
+                out = self.stats()
+            elif op == "unload":
+                name, _ = self._session(req)
+                del self.maps[name]
+                out = {"map": name}
+            else:
+                raise ValueError(f"unknown op {op!r}")
+        except KeyError as e:
+            out = {"ok": False, "error": f"missing field {e.args[0]!r}"}
+        except (ValueError, TypeError, OSError) as e:
+            out = {"ok": False, "error": str(e)}
+        except Exception as e:          # never leave a client waiting on its id
+            from concurrent.futures.process import BrokenProcessPool
+            if isinstance(e, BrokenProcessPool):
+                self.executor = self._new_executor()    # a worker died; start afresh
+            out = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        else:
+            out["ok"] = True
+        if "id" in req: out["id"] = req["id"]
+        return out
+
+    async def _query(self, req):
+        import asyncio
+        name, sess = self._session(req)
+        start  = sess.check_cell(tuple(req["start"]))
+        target = sess.check_cell(tuple(req["target"]))
+        algo      = ALGO_ALIASES.get(req.get("algo", "astar"), req.get("algo"))
+        heuristic = HEURISTIC_ALIASES.get(req.get("heuristic", "manhattan"),
+                                          req.get("heuristic"))
+        if algo not in ALGO_ALIASES.values():
+            raise ValueError(f"unknown algo {req.get('algo')!r}")
+        if heuristic not in HEURISTIC_ALIASES.values():
+            raise ValueError(f"unknown heuristic {req.get('heuristic')!r}")
+        diagonal = self.diagonal
+        if "connectivity" in req:
+            if req["connectivity"] not in (4, 8):
+                raise ValueError(f"connectivity must be 4 or 8, got {req['connectivity']!r}")
+            if req["connectivity"] == 4 and algo != WAVEFRONT_ALGO:
+                raise ValueError("connectivity 4 needs algo wavefront; "
+                                 "the other searches move 8 ways")
+            diagonal = req["connectivity"] == 8
+        diagonal = diagonal or algo != WAVEFRONT_ALGO
+        self.queries += 1
+
+        key = (sess.zobrist.value, sess.rows, sess.cols, start, target, algo, heuristic,
+               diagonal)
+        cached = sess.cache.get(key)
+        expanded, elapsed, coalesced = 0, 0.0, False
+        if cached is not None:
+            route = list(cached)
+        else:
+            fut = self.inflight.get((name, key))
+            if fut is None:
+                self.searches += 1
+                fut = asyncio.get_running_loop().run_in_executor(
+                    self.executor, _service_search, sess.id, bytes(sess.occ),
+                    sess.rows, sess.cols, sess.erase_epoch,
+                    start, target, algo, heuristic, diagonal)
+                self.inflight[(name, key)] = fut
+                fut.add_done_callback(lambda f: self._finish(name, sess, key, f))
+            else:
+                self.coalesced += 1
+                coalesced = True
+            route, expanded, elapsed = await asyncio.shield(fut)
+            if coalesced:
+                expanded, elapsed = 0, 0.0      # the leader's query did the work
+
+        out = {"found": bool(route), "algo": algo, "start": start, "target": target,
+               "path": densify(route) if algo == THETA_ALGO else route,
+               "cost": round(path_cost(route), 3), "expanded": expanded,
+               "time_ms": round(elapsed, 3), "cached": cached is not None,
+               "coalesced": coalesced}
+        if algo == THETA_ALGO: out["waypoints"] = route
+        return out
+
+    def _finish(self, name, sess, key, fut):
+        self.inflight.pop((name, key), None)
+        if not fut.cancelled() and fut.exception() is None:
+            sess.cache.put(key, tuple(fut.result()[0]))
+
+    def stats(self):
+        return {
+            "queries": self.queries, "searches": self.searches,
+            "coalesced": self.coalesced, "inflight": len(self.inflight),
+            "maps": {name: {"rows": s.rows, "cols": s.cols, "hash": s.zobrist.value,
+                            "cache": {"size": len(s.cache), "hits": s.cache.hits,
+                                      "misses": s.cache.misses,
+                                      "evictions": s.cache.evictions}}
+                     for name, s in self.maps.items()},
+        }
+
+    async def _client(self, reader, writer):
+        import asyncio, json
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def answer(req):
+            reply = await self.handle(req)
+            async with lock:
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                if not line.strip(): continue
+                try:
+                    req = json.loads(line)
+                    if not isinstance(req, dict): raise ValueError("expected an object")
+                except ValueError as e:
+                    async with lock:
+                        writer.write(json.dumps({"ok": False, "error": f"bad request: {e}"})
+                                     .encode() + b"\n")
+                    continue
+                # Answer concurrently so one slow search does not hold up
+                # the rest of this client's pipeline; replies carry the id.
+                task = asyncio.ensure_future(answer(req))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, host="127.0.0.1", port=DEFAULT_SERVICE_PORT,
+                    ready=None):
+        """Listen on a Unix socket (if given) or localhost TCP until cancelled."""
+        import asyncio, os, signal, stat
+        try:        # SIGTERM unwinds through the finally below, retiring the workers
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                          asyncio.current_task().cancel)
+        except (NotImplementedError, RuntimeError):
+            pass    # no loop signal handlers on Windows
+        if socket_path:
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)          # stale socket from a previous run
+            server = await asyncio.start_unix_server(self._client, path=socket_path,
+                                                     limit=_SERVICE_LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self._client, host, port,
+                                                limit=_SERVICE_LINE_LIMIT)
+        if ready is not None: ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            import sys
+            if sys.version_info >= (3, 9):
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                self.executor.shutdown(wait=False)
+
 
 # ─────────────────────────────────────────────
 #  MAIN APPLICATION
 # ─────────────────────────────────────────────
 class DynamicPathfinderApp:
     def __init__(self, root):
+        _load_tk()
         self.root = root
         self.root.title(" Dynamic pathfinding agent (Informed searches)")
         self.root.configure(bg=BG_DEEP)
@@ -112,15 +2011,39 @@ class DynamicPathfinderApp:
         self.running      = False
         self.current_path = []
         self.agent_pos    = None
+        self.agent_pairs  = []     # extra [start, target] pairs for multi-agent runs
+        self.tour_goals   = []     # waypoints visited before T, in click order
+        self.last_spawn   = None
 
         # Metrics
         self.nodes_visited = 0
         self.path_cost     = 0.0
         self.exec_time_ms  = 0.0
         self.replans       = 0
-
-        # Search steps log for step-by-step animation
-        self.search_log    = []   # list of (type, r, c)  — "v"=visited "f"=frontier
+        self.cache_hit     = None   # None = no search yet
+        self.waypoints     = 0
+        self.tour_order    = []     # stops of the last tour plan, start → T
+        self.stats         = SearchStats()
+        self._search_polls = 0
+
+        # Result cache keyed by the Zobrist hash of the wall layout
+        self.zobrist       = ZobristHash(self.rows, self.cols)
+        self.search_cache  = SearchCache(DEFAULT_CACHE_SIZE)
+
+        # ALT landmark tables, rebuilt on a worker thread after wall edits.
+        # wall_erase_epoch counts wall removals: a table built in the same
+        # epoch is still admissible, however many walls were added since.
+        self.landmarks        = None
+        self.landmark_source  = ""
+        self.wall_erase_epoch = 0
+        self._landmark_job    = None
+        self._landmark_gen    = 0
+
+        # Trace of the last search, replayed on the canvas afterwards
+        self.search_log    = SearchTrace(self.rows, self.cols)
+        self.replay_pos    = 0
+        self.replay_paused = False
+        self.replaying     = False
 
         self._build_ui()
         self._init_grid()
@@ -281,7 +2204,9 @@ class DynamicPathfinderApp:
                  font=("Consolas", 8)).pack(anchor="w", padx=8, pady=(6,0))
         self.algo_var = tk.StringVar(value="A*")
         algo_cb = ttk.Combobox(c, textvariable=self.algo_var,
-                               values=["A*", "Greedy Best-First (GBFS)"],
+                               values=["A*", "Greedy Best-First (GBFS)", THETA_ALGO,
+                                       IDA_ALGO] +
+                                      ([WAVEFRONT_ALGO] if numpy_available() else []),
                                state="readonly", font=("Consolas", 10))
         algo_cb.pack(fill=tk.X, padx=8, pady=(2,6))
         self._style_combo(algo_cb)
@@ -290,10 +2215,33 @@ class DynamicPathfinderApp:
                  font=("Consolas", 8)).pack(anchor="w", padx=8)
         self.heuristic_var = tk.StringVar(value="Manhattan")
         h_cb = ttk.Combobox(c, textvariable=self.heuristic_var,
-                             values=["Manhattan", "Euclidean", "Chebyshev", "Octile"],
+                             values=["Manhattan", "Euclidean", "Chebyshev", "Octile",
+                                     ALT_HEURISTIC],
                              state="readonly", font=("Consolas", 10))
-        h_cb.pack(fill=tk.X, padx=8, pady=(2,8))
+        h_cb.pack(fill=tk.X, padx=8, pady=(2,6))
         self._style_combo(h_cb)
+        h_cb.bind("<<ComboboxSelected>>", lambda e: self._schedule_landmarks())
+
+        cache_row = tk.Frame(c, bg=BG_SURFACE0)
+        cache_row.pack(fill=tk.X, padx=8, pady=(0,8))
+        tk.Label(cache_row, text="Result cache size", bg=BG_SURFACE0,
+                 fg=TEXT_DIM, font=("Consolas", 8)).pack(side=tk.LEFT)
+        self.cache_size_var = tk.IntVar(value=DEFAULT_CACHE_SIZE)
+        tk.Spinbox(cache_row, from_=0, to=1024, textvariable=self.cache_size_var,
+                   width=5, font=("Consolas", 10), bg=BG_SURFACE1,
+                   fg=TEXT_MAIN, buttonbackground=BG_OVERLAY,
+                   relief="flat", highlightthickness=0).pack(side=tk.RIGHT)
+
+        tt_row = tk.Frame(c, bg=BG_SURFACE0)
+        tt_row.pack(fill=tk.X, padx=8, pady=(0,8))
+        tk.Label(tt_row, text="IDA* table slots", bg=BG_SURFACE0,
+                 fg=TEXT_DIM, font=("Consolas", 8)).pack(side=tk.LEFT)
+        self.tt_size_var = tk.IntVar(value=DEFAULT_TT_SIZE)
+        tk.Spinbox(tt_row, from_=1, to=1 << 20, increment=1024,
+                   textvariable=self.tt_size_var,
+                   width=7, font=("Consolas", 10), bg=BG_SURFACE1,
+                   fg=TEXT_MAIN, buttonbackground=BG_OVERLAY,
+                   relief="flat", highlightthickness=0).pack(side=tk.RIGHT)
 
         divider()
 
@@ -305,15 +2253,23 @@ class DynamicPathfinderApp:
             ("  Set Target", "T",    ACCENT_CYAN,  BTN_PRIMARY),
             ("   Draw Wall",  "Wall", ACCENT_PINK,  BTN_DANGER),
             ("  Erase",      "Erase",TEXT_MAIN,    BTN_NEUTRAL),
+            ("  Agent Pair", "A",    C_AGENT,      BTN_NEUTRAL),
+            ("  Waypoint",   "W",    ACCENT_PURP,  BTN_NEUTRAL),
         ]
         row1 = tk.Frame(p, bg=BG_MANTLE); row1.pack(fill=tk.X, padx=10, pady=2)
         row2 = tk.Frame(p, bg=BG_MANTLE); row2.pack(fill=tk.X, padx=10, pady=2)
+        row3 = tk.Frame(p, bg=BG_MANTLE); row3.pack(fill=tk.X, padx=10, pady=2)
+        row4 = tk.Frame(p, bg=BG_MANTLE); row4.pack(fill=tk.X, padx=10, pady=2)
 
         for i, (lbl, mode, fg, bg) in enumerate(modes):
-            parent_row = row1 if i < 2 else row2
+            parent_row = (row1, row1, row2, row2, row3, row4)[i]
             b = small_btn(parent_row, lbl, lambda m=mode: self._set_mode(m),
                           bg=bg, fg=fg, accent=fg)
             self.mode_btns[mode] = b
+        small_btn(row3, "  Clear Agents", self._clear_agents,
+                  bg=BTN_NEUTRAL, fg=TEXT_DIM, accent=BG_OVERLAY)
+        small_btn(row4, "  Clear Waypoints", self._clear_waypoints,
+                  bg=BTN_NEUTRAL, fg=TEXT_DIM, accent=BG_OVERLAY)
 
         divider()
 
@@ -369,6 +2325,13 @@ class DynamicPathfinderApp:
         small_btn(ctrl_row, " Reset All", self._reset_grid,
                   bg=BTN_DANGER, fg=ACCENT_PINK, accent=ACCENT_PINK)
 
+        file_row = tk.Frame(p, bg=BG_MANTLE)
+        file_row.pack(fill=tk.X, padx=10, pady=2)
+        small_btn(file_row, "  Load Map", self._load_map_file,
+                  bg=BTN_NEUTRAL, fg=ACCENT_CYAN, accent=ACCENT_CYAN)
+        small_btn(file_row, "  Save Map", self._save_map_file,
+                  bg=BTN_NEUTRAL, fg=ACCENT_CYAN, accent=ACCENT_CYAN)
+
         divider()
 
         # ── DYNAMIC MODE ───────────────────────────────
@@ -413,6 +2376,42 @@ class DynamicPathfinderApp:
                  highlightthickness=0, length=120,
                  activebackground=ACCENT_PURP).pack(side=tk.RIGHT)
 
+        scrub_row = tk.Frame(spd_card, bg=BG_SURFACE0)
+        scrub_row.pack(fill=tk.X, padx=8, pady=(0,4))
+        tk.Label(scrub_row, text="Replay", bg=BG_SURFACE0,
+                 fg=TEXT_DIM, font=("Consolas", 8)).pack(side=tk.LEFT)
+        self.scrub = tk.Scale(scrub_row, from_=0, to=0, orient="horizontal",
+                              command=self._on_scrub, showvalue=False,
+                              bg=BG_SURFACE0, fg=TEXT_DIM, troughcolor=BG_OVERLAY,
+                              sliderrelief="flat", highlightthickness=0, length=150,
+                              activebackground=ACCENT_PURP)
+        self.scrub.pack(side=tk.RIGHT)
+
+        replay_row = tk.Frame(spd_card, bg=BG_SURFACE0)
+        replay_row.pack(fill=tk.X, padx=6, pady=(0,6))
+        self.pause_btn = small_btn(replay_row, "Pause", self._toggle_pause)
+        small_btn(replay_row, "Skip", self._skip_replay)
+        small_btn(replay_row, "Save Trace", self._save_trace,
+                  fg=ACCENT_CYAN, accent=ACCENT_CYAN)
+
+        divider()
+
+        # ── PROFILING ──────────────────────────────────
+        sec_label("PROFILING", TEXT_DIM)
+        prof_card = card()
+        self.deep_profile_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            prof_card, text="  cProfile + tracemalloc",
+            variable=self.deep_profile_var,
+            bg=BG_SURFACE0, fg=TEXT_MAIN, selectcolor=BG_SURFACE1,
+            activebackground=BG_SURFACE0, activeforeground=TEXT_MAIN,
+            font=("Consolas", 9), indicatoron=True
+        ).pack(anchor="w", padx=8, pady=(6,2))
+        prof_row = tk.Frame(prof_card, bg=BG_SURFACE0)
+        prof_row.pack(fill=tk.X, padx=6, pady=(0,6))
+        small_btn(prof_row, "Export Profile (JSON)", self._export_profile,
+                  bg=BTN_NEUTRAL, fg=ACCENT_CYAN, accent=ACCENT_CYAN)
+
         divider()
 
         # ── METRICS DASHBOARD ──────────────────────────
@@ -428,7 +2427,13 @@ class DynamicPathfinderApp:
             ("visited",   "Nodes Visited", ACCENT_AMBER),
             ("cost",      "Path Cost",     ACCENT_GREEN),
             ("time",      "Time (ms)",     TEXT_MAIN),
+            ("search_ms", "  search",      TEXT_MAIN),
+            ("render_ms", "  render+sleep",TEXT_DIM),
+            ("heap",      "Heap peak",     ACCENT_AMBER),
             ("replans",   "Re-plans",      ACCENT_PINK),
+            ("cache",     "Cache",         TEXT_MAIN),
+            ("landmarks", "Landmarks",     ACCENT_CYAN),
+            ("waypoints", "Waypoints",     ACCENT_PURP),
         ]
         for key, label, fg_c in rows_data:
             row = tk.Frame(m_card, bg=BG_SURFACE0)
@@ -526,6 +2531,23 @@ class DynamicPathfinderApp:
         self.canvas.delete("all")
         self.rects = {}
         self.grid  = [[0]*self.cols for _ in range(self.rows)]
+        self.agent_pairs = []
+        self.tour_goals  = []
+        self.tour_order  = []
+        self.search_log = SearchTrace(self.rows, self.cols)
+        self.replay_pos = 0
+        self.scrub.config(to=0)
+        self.zobrist = ZobristHash(self.rows, self.cols)
+        self.los     = LineOfSightCache(bytearray(self.rows * self.cols),
+                                        self.rows, self.cols)
+        self.tour    = TourPlanner(bytearray(self.rows * self.cols),
+                                   self.rows, self.cols)
+        # The old layout is gone, walls included: retire any table built
+        # (or still building on a worker thread) against it.
+        self.landmarks = None
+        self.wall_erase_epoch += 1
+        self._landmark_gen    += 1
+        self._schedule_landmarks()
 
         for r in range(self.rows):
             for c in range(self.cols):
@@ -555,6 +2577,45 @@ class DynamicPathfinderApp:
         self._place_defaults()
         self._set_status("Grid resized.", ACCENT_CYAN)
 
+    # ──────────────────────────────────────────
+    #  MAP FILES
+    # ──────────────────────────────────────────
+    def load_map(self, fname):
+        """Replace the grid with a map file (see parse_map for the format)."""
+        grid, start, target = load_map(fname)
+        self.rows, self.cols = len(grid), len(grid[0])
+        self.rows_var.set(self.rows);  self.cols_var.set(self.cols)
+        self._init_grid()
+        self.start_pos  = start  or (min(1, self.rows-1), min(1, self.cols-1))
+        self.target_pos = target or (self.rows-2, self.cols-2)
+        for r, row in enumerate(grid):
+            for c, v in enumerate(row):
+                if v == -1 and (r, c) not in (self.start_pos, self.target_pos):
+                    self._set_cell(r, c, -1)
+                    self._paint(r, c, C_OBSTACLE)
+        self._paint(*self.start_pos, C_START, "S")
+        self._paint(*self.target_pos, C_TARGET, "T")
+        self._set_status(f"Loaded {self.rows}×{self.cols} map.", ACCENT_CYAN)
+
+    def _load_map_file(self):
+        if self.running: return
+        fname = filedialog.askopenfilename(
+            title="Load map", filetypes=[("Map", "*.txt *.map"), ("All", "*")])
+        if not fname: return
+        try:
+            self.load_map(fname)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Load Map", str(e))
+
+    def _save_map_file(self):
+        fname = filedialog.asksaveasfilename(
+            title="Save map", defaultextension=".txt",
+            filetypes=[("Map", "*.txt *.map")])
+        if not fname: return
+        with open(fname, "w", encoding="utf-8") as f:
+            f.write(format_map(self.grid, self.start_pos, self.target_pos))
+        self._set_status("Map saved.", ACCENT_CYAN)
+
     # ──────────────────────────────────────────
     #  PAINTING
     # ──────────────────────────────────────────
@@ -593,6 +2654,36 @@ class DynamicPathfinderApp:
         self.metric_labels["cost"].config(text=f"{self.path_cost:.1f}")
         self.metric_labels["time"].config(text=f"{self.exec_time_ms:.2f}")
         self.metric_labels["replans"].config(text=str(self.replans))
+        st = self.stats
+        self.metric_labels["search_ms"].config(text=f"{st.search_ms():.2f}")
+        self.metric_labels["render_ms"].config(
+            text=f"{st.seconds['render']*1000:.1f} + {st.seconds['sleep']*1000:.1f}")
+        self.metric_labels["heap"].config(
+            text=f"{st.heap_peak:,}  (+{st.repushes} re-push)")
+        cache = self.search_cache
+        if self.cache_hit is None:
+            self.metric_labels["cache"].config(text="—")
+        else:
+            self.metric_labels["cache"].config(
+                text=f"{'HIT' if self.cache_hit else 'miss'}  "
+                     f"({cache.hits}/{cache.hits + cache.misses} hits)")
+        los = self.los
+        if self.tour_order:
+            label = {cell: f"W{i}" for i, cell in enumerate(self.tour_goals, start=1)}
+            stops = [label.get(cell, "?") for cell in self.tour_order[1:-1]]
+            self.metric_labels["waypoints"].config(
+                text=f"{len(stops)}  ({' → '.join(stops + ['T'])})")
+        elif self.algo_var.get() == THETA_ALGO and self.waypoints:
+            self.metric_labels["waypoints"].config(
+                text=f"{self.waypoints}  (LOS {los.hits}/{los.hits + los.misses} hits)")
+        else:
+            self.metric_labels["waypoints"].config(text="—")
+        lm = self.landmarks
+        if self.heuristic_var.get() == ALT_HEURISTIC and lm is not None:
+            self.metric_labels["landmarks"].config(
+                text=f"{len(lm)} · {lm.build_ms:.0f} ms ({self.landmark_source})")
+        else:
+            self.metric_labels["landmarks"].config(text="—")
 
     def _set_status(self, msg, color=TEXT_MAIN):
         self.status_lbl.config(text=f"◉  {msg}", fg=color)
@@ -604,7 +2695,8 @@ class DynamicPathfinderApp:
     def _set_mode(self, mode):
         self.mode = mode
         colors = {"S": ACCENT_GREEN, "T": ACCENT_CYAN,
-                  "Wall": ACCENT_PINK, "Erase": TEXT_MAIN}
+                  "Wall": ACCENT_PINK, "Erase": TEXT_MAIN, "A": C_AGENT,
+                  "W": ACCENT_PURP}
         self._set_status(f"Mode: {mode}", colors.get(mode, TEXT_MAIN))
 
     def _cell_from_event(self, event):
@@ -629,37 +2721,100 @@ class DynamicPathfinderApp:
     def _on_right_click(self, event):
         if self.running: return
         r, c = self._cell_from_event(event)
-        if r is not None and (r,c) not in (self.start_pos, self.target_pos):
-            self.grid[r][c] = 0
+        if r is not None and (r,c) not in self._markers():
+            self._set_cell(r, c, 0)
             self._paint(r, c, C_EMPTY)
 
+    def _set_cell(self, r, c, value):
+        """Write grid[r][c], keeping the Zobrist hash in step with wall toggles."""
+        if (self.grid[r][c] == -1) != (value == -1):
+            self.zobrist.toggle(r, c)
+            self.los.set_cell(r, c, value == -1)
+            self.tour.set_cell(r, c, value == -1)
+            if value != -1:
+                self.wall_erase_epoch += 1
+            self._schedule_landmarks()
+        self.grid[r][c] = value
+
     def _handle_cell(self, r, c):
         if self.mode == "S":
             if self.start_pos:
                 self._paint(*self.start_pos, C_EMPTY)
-                self.grid[self.start_pos[0]][self.start_pos[1]] = 0
+                self._set_cell(*self.start_pos, 0)
             self.start_pos = (r, c)
-            self.grid[r][c] = 0
+            self._set_cell(r, c, 0)
             self._paint(r, c, C_START, "S")
 
         elif self.mode == "T":
             if self.target_pos:
                 self._paint(*self.target_pos, C_EMPTY)
-                self.grid[self.target_pos[0]][self.target_pos[1]] = 0
+                self._set_cell(*self.target_pos, 0)
             self.target_pos = (r, c)
-            self.grid[r][c] = 0
+            self._set_cell(r, c, 0)
             self._paint(r, c, C_TARGET, "T")
 
         elif self.mode == "Wall":
-            if (r,c) in (self.start_pos, self.target_pos): return
-            self.grid[r][c] = -1
+            if (r,c) in self._markers(): return
+            self._set_cell(r, c, -1)
             self._paint(r, c, C_OBSTACLE)
 
         elif self.mode == "Erase":
-            if (r,c) in (self.start_pos, self.target_pos): return
-            self.grid[r][c] = 0
+            if (r,c) in self._markers(): return
+            self._set_cell(r, c, 0)
             self._paint(r, c, C_EMPTY)
 
+        elif self.mode == "A":
+            # Clicks alternate: start of a new pair, then its target
+            if (r,c) in self._markers(): return
+            self._set_cell(r, c, 0)
+            if self.agent_pairs and self.agent_pairs[-1][1] is None:
+                self.agent_pairs[-1][1] = (r, c)
+            else:
+                self.agent_pairs.append([(r, c), None])
+            self._paint_markers()
+
+        elif self.mode == "W":
+            # Click toggles a waypoint
+            if (r,c) in self.tour_goals:
+                self.tour_goals.remove((r, c))
+                self._paint(r, c, C_EMPTY)
+            elif (r,c) not in self._markers():
+                self._set_cell(r, c, 0)
+                self.tour_goals.append((r, c))
+            self._paint_markers()
+
+    def _markers(self):
+        """Cells holding S / T or an agent pair's start / target."""
+        cells = {self.start_pos, self.target_pos}
+        for pair in self.agent_pairs:
+            cells.update(pair)
+        cells.update(self.tour_goals)
+        cells.discard(None)
+        return cells
+
+    def _paint_markers(self):
+        for i, (s, t) in enumerate(self.agent_pairs, start=2):
+            self._paint(*s, C_START, f"S{i}")
+            if t: self._paint(*t, C_TARGET, f"T{i}")
+        for i, cell in enumerate(self.tour_goals, start=1):
+            self._paint(*cell, C_TARGET, f"W{i}")
+
+    def _clear_agents(self):
+        if self.running: return
+        for pair in self.agent_pairs:
+            for cell in pair:
+                if cell: self._paint(*cell, C_EMPTY)
+        self.agent_pairs = []
+        self._set_status("Agent pairs cleared.", TEXT_DIM)
+
+    def _clear_waypoints(self):
+        if self.running: return
+        for cell in self.tour_goals:
+            self._paint(*cell, C_EMPTY)
+        self.tour_goals = []
+        self.tour_order = []
+        self._set_status("Waypoints cleared.", TEXT_DIM)
+
     # ──────────────────────────────────────────
     #  GRID MANAGEMENT
     # ──────────────────────────────────────────
@@ -669,6 +2824,7 @@ class DynamicPathfinderApp:
         self.current_path = []
         self.agent_pos    = None
         self.nodes_visited = self.path_cost = self.exec_time_ms = self.replans = 0
+        self.cache_hit     = None
         self._init_grid()
         self._place_defaults()
         self._update_metrics()
@@ -683,12 +2839,13 @@ class DynamicPathfinderApp:
                 if (r,c) == self.start_pos:   self._paint(r, c, C_START,  "S")
                 elif (r,c) == self.target_pos: self._paint(r, c, C_TARGET, "T")
                 else:                          self._paint(r, c, C_EMPTY)
+        self._paint_markers()
 
     def _clear_walls(self):
         for r in range(self.rows):
             for c in range(self.cols):
                 if self.grid[r][c] == -1:
-                    self.grid[r][c] = 0
+                    self._set_cell(r, c, 0)
                     self._paint(r, c, C_EMPTY)
         self._set_status("Walls cleared.", TEXT_DIM)
 
@@ -698,132 +2855,271 @@ class DynamicPathfinderApp:
                 "Place Start (S) and Target (T) first.")
             return
         density = self.density_var.get() / 100.0
+        markers = self._markers()
         for r in range(self.rows):
             for c in range(self.cols):
-                if (r,c) in (self.start_pos, self.target_pos): continue
+                if (r,c) in markers: continue
                 if random.random() < density:
-                    self.grid[r][c] = -1;  self._paint(r, c, C_OBSTACLE)
+                    self._set_cell(r, c, -1);  self._paint(r, c, C_OBSTACLE)
                 else:
-                    self.grid[r][c] = 0;   self._paint(r, c, C_EMPTY)
+                    self._set_cell(r, c, 0);   self._paint(r, c, C_EMPTY)
         self._set_status("Random map generated.", ACCENT_AMBER)
 
     # ──────────────────────────────────────────
-    #  HEURISTIC SELECTOR
+    #  ALT LANDMARKS
     # ──────────────────────────────────────────
-    def _get_h(self, r, c):
-        gr, gc = self.target_pos
-        name = self.heuristic_var.get()
-        if   name == "Manhattan":  return h_manhattan(r, c, gr, gc)
-        elif name == "Euclidean":  return h_euclidean(r, c, gr, gc)
-        elif name == "Chebyshev":  return h_chebyshev(r, c, gr, gc)
-        else:                      return h_octile(r, c, gr, gc)
-
-    def _move_cost(self, dr, dc):
-        return 1.414 if (dr,dc) in DIAGONAL_MOVES else 1.0
-
-    def _get_neighbors(self, node):
-        out = []
-        for dr, dc in MOVES:
-            nr, nc = node.r+dr, node.c+dc
-            if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                if self.grid[nr][nc] != -1:
-                    g = node.g + self._move_cost(dr, dc)
-                    h = self._get_h(nr, nc)
-                    out.append(Node(nr, nc, node, g, h))
-        return out
+    def _schedule_landmarks(self):
+        """Debounced background rebuild of the landmark tables (ALT only)."""
+        if self._landmark_job is None:
+            self._landmark_job = self.root.after(250, self._rebuild_landmarks_bg)
+
+    def _rebuild_landmarks_bg(self):
+        self._landmark_job = None
+        if self.heuristic_var.get() != ALT_HEURISTIC: return
+        self._landmark_gen += 1
+        gen   = self._landmark_gen
+        occ   = bytes(occupancy_from_grid(self.grid))
+        args  = (occ, self.rows, self.cols)
+        kw    = dict(epoch=self.wall_erase_epoch, grid_hash=self.zobrist.value)
+
+        def work():
+            table = LandmarkTable(*args, **kw)
+            if gen == self._landmark_gen:     # drop results overtaken by edits
+                self.landmarks       = table
+                self.landmark_source = "background"
+
+        import threading
+        threading.Thread(target=work, daemon=True).start()
+
+    def _landmarks_for_search(self):
+        """Current table if still admissible, else build one synchronously."""
+        lm = self.landmarks
+        if (lm is None or (lm.rows, lm.cols) != (self.rows, self.cols)
+                or lm.epoch != self.wall_erase_epoch):
+            self._landmark_gen += 1          # supersede any running rebuild
+            lm = LandmarkTable(occupancy_from_grid(self.grid), self.rows, self.cols,
+                               epoch=self.wall_erase_epoch,
+                               grid_hash=self.zobrist.value)
+            self.landmarks       = lm
+            self.landmark_source = "sync"
+        return lm
 
     # ──────────────────────────────────────────
     #  SEARCH CORE
     # ──────────────────────────────────────────
     def _search(self, sr, sc):
         """
-        Unified A* / GBFS search with live canvas animation.
-        Returns goal Node (with parent chain) or None.
+        Run search_grid on the current grid at full speed, recording every
+        expansion and frontier push into self.search_log.  Returns the route (cells, or waypoints for Lazy Theta*), or None
+        if the target is unreachable.
         """
-        algo  = self.algo_var.get()
-        delay = self.speed_var.get() / 1000.0
-
-        h0   = self._get_h(sr, sc)
-        s_node = Node(sr, sc, None, g=0, h=h0)
-        s_node.f = s_node.h if "GBFS" in algo else s_node.g + s_node.h
-
-        heap    = []
-        counter = 0
-        heapq.heappush(heap, (s_node.f, counter, s_node))
-
-        open_map  = {(sr, sc): s_node.f}   # pos -> f  for fast updates
-        closed    = set()
-
-        while heap and self.running:
-            _, _, curr = heapq.heappop(heap)
-            pos = curr.pos()
-            if pos in closed: continue
-
-            closed.add(pos)
-            self.nodes_visited += 1
-
-            # Visualise visited cell
-            if pos not in (self.start_pos, self.target_pos):
-                self._paint(curr.r, curr.c, C_VISITED)
-                self.root.update()
-                time.sleep(delay)
-
-            if pos == self.target_pos:
-                return curr
-
-            for nb in self._get_neighbors(curr):
-                np = nb.pos()
-                if np in closed: continue
-
-                nb.f = nb.h if "GBFS" in algo else nb.g + nb.h
+        trace = self.search_log = SearchTrace(self.rows, self.cols)
+        algo      = self.algo_var.get()
+        heuristic = self.heuristic_var.get()
+        if heuristic == ALT_HEURISTIC and algo not in NO_HEURISTIC_ALGOS:
+            heuristic = self._landmarks_for_search().heuristic(self.target_pos)
+
+        goal, expanded = search_grid(
+            occupancy_from_grid(self.grid), self.rows, self.cols,
+            (sr, sc), self.target_pos,
+            algo, heuristic,
+            on_expand=trace.expand, on_push=trace.push, on_layer=trace.layer,
+            keep_going=self._keep_searching,
+            stats=self.stats, los=self.los,
+            tt_size=self._tt_size(),
+        )
+        self.nodes_visited += expanded
+        return extract_path(goal) if goal else None
 
-                if np not in open_map or nb.f < open_map[np]:
-                    open_map[np] = nb.f
-                    counter += 1
-                    heapq.heappush(heap, (nb.f, counter, nb))
-                    if np not in (self.start_pos, self.target_pos):
-                        self._paint(nb.r, nb.c, C_FRONTIER)
+    def _keep_searching(self):
+        """
+        search_grid's keep_going: pumps Tk events every SEARCH_POLL
+        expansions so the window stays live and Stop / Esc can end a long
+        search by clearing self.running.
+        """
+        self._search_polls += 1
+        if self._search_polls % SEARCH_POLL == 0:
+            self.root.update()
+        return self.running
 
-        return None
+    def _tt_size(self):
+        return max(1, self.tt_size_var.get())
 
-    def _extract_path(self, goal_node):
-        path = []
-        n = goal_node
-        while n:
-            path.append(n.pos())
-            n = n.parent
-        path.reverse()
-        return path
+    def _plan(self, sr, sc):
+        """
+        Cached front end to _search.  A hit skips the search entirely;
+        a miss searches, then replays the trace on the canvas.  Sets
+        exec_time_ms / path_cost / waypoints and returns the cells the
+        agent walks.  IDA*'s table size changes its result (and the bound
+        step its cost), so both are part of an IDA* key.
+        """
+        algo = self.algo_var.get()
+        key = (self.zobrist.value, self.rows, self.cols, (sr, sc),
+               self.target_pos, algo, self.heuristic_var.get(),
+               (self._tt_size(), DEFAULT_BOUND_STEP) if algo == IDA_ALGO else None)
+        self.search_cache.resize(self.cache_size_var.get())
+        cached = self.search_cache.get(key)
+        self.cache_hit = cached is not None
+        if cached is not None:
+            route = list(cached) or None
+            self.exec_time_ms = 0.0
+            self.search_log = SearchTrace(self.rows, self.cols)
+        else:
+            t0 = time.perf_counter()
+            route = self._search(sr, sc)
+            self.exec_time_ms = (time.perf_counter() - t0) * 1000
+            if not self.running:            # stopped mid-search: nothing to keep
+                return None
+            self.search_cache.put(key, tuple(route or ()))
+            self._replay_trace()
+
+        if route is None:
+            self.waypoints = 0
+            return None
+        # Calculate actual path cost (using step costs)
+        self.path_cost = path_cost(route)
+        self.waypoints = len(route)
+        return densify(route) if algo == THETA_ALGO else route
 
     def _draw_path(self, path):
         for r, c in path:
             if (r,c) not in (self.start_pos, self.target_pos):
                 self._paint(r, c, C_PATH)
 
+    # ──────────────────────────────────────────
+    #  TRACE REPLAY
+    # ──────────────────────────────────────────
+    def _paint_event(self, kind, r, c):
+        if kind == TRACE_LAYER: return
+        if (r, c) in (self.start_pos, self.target_pos): return
+        self._paint(r, c, C_VISITED if kind == TRACE_EXPAND else C_FRONTIER)
+
+    def _replay_step(self, pos):
+        """
+        Apply events from pos up to and including the next expansion — or,
+        for a wavefront trace, the whole next layer.
+        """
+        trace = self.search_log
+        frame_end = TRACE_LAYER if trace.layered else TRACE_EXPAND
+        while pos < len(trace):
+            kind, r, c = trace[pos]
+            self._paint_event(kind, r, c)
+            pos += 1
+            if kind == frame_end: break
+        return pos
+
+    def _replay_trace(self):
+        """
+        Animate self.search_log one expansion (or wavefront layer) per
+        frame at the current delay.  Pause, the scrub bar and Skip act on it
+        while it plays.
+        """
+        trace = self.search_log
+        self.replay_pos    = 0
+        self.replay_paused = False
+        self.pause_btn.config(text="Pause")
+        self.scrub.config(to=len(trace))
+
+        self.replaying = True
+        try:
+            while self.running and self.replay_pos < len(trace):
+                if self.replay_paused:
+                    self.root.update()
+                    time.sleep(0.03)
+                    continue
+                t0 = time.perf_counter()
+                self.replay_pos = self._replay_step(self.replay_pos)
+                self.scrub.set(self.replay_pos)
+                self._show_frame(t0, self.speed_var.get() / 1000.0)
+        finally:
+            self.replaying = False
+
+    def _show_frame(self, t0, delay):
+        """
+        Flush a frame whose painting began at perf_counter() `t0`, then hold
+        it for `delay` s.  The two parts go to SearchStats as render / sleep,
+        so replays and agent walks both show up in the profile.
+        """
+        self.root.update()
+        t1 = time.perf_counter()
+        time.sleep(delay)
+        self.stats.add("render", t1 - t0)
+        self.stats.add("sleep", time.perf_counter() - t1)
+
+    def _seek(self, pos):
+        """
+        Repaint the canvas as it was after the first `pos` trace events.
+        The wipe also clears traced path cells, so once the search is over
+        the end of the trace redraws the path and markers on top.
+        """
+        trace = self.search_log
+        pos   = max(0, min(pos, len(trace)))
+        markers = self._markers()
+        for v in set(trace.events):
+            if v & 3 == TRACE_LAYER: continue
+            r, c = divmod(v >> 2, trace.cols)
+            if (r, c) not in markers and self.grid[r][c] != -1:
+                self._paint(r, c, C_EMPTY)
+        for i in range(pos):
+            self._paint_event(*trace[i])
+        if pos == len(trace) and not self.replaying:
+            self._draw_path(self.current_path)
+            self._paint_markers()
+        self.replay_pos = pos
+        self.scrub.set(pos)
+
+    def _on_scrub(self, value):
+        pos = int(float(value))
+        if pos != self.replay_pos:          # ignore our own scrub.set()
+            self._seek(pos)
+
+    def _toggle_pause(self):
+        self.replay_paused = not self.replay_paused
+        self.pause_btn.config(text="Play" if self.replay_paused else "Pause")
+
+    def _skip_replay(self):
+        self.replay_paused = False
+        self.pause_btn.config(text="Pause")
+        self._seek(len(self.search_log))
+
+    def _save_trace(self):
+        if not len(self.search_log):
+            messagebox.showinfo("Trace", "No search trace to save yet.")
+            return
+        fname = filedialog.asksaveasfilename(
+            title="Save search trace", defaultextension=".pftrace",
+            filetypes=[("Search trace", "*.pftrace")])
+        if not fname: return
+        self.search_log.save(fname)
+        self._set_status(f"Trace saved ({len(self.search_log):,} events).", ACCENT_CYAN)
+
     # ──────────────────────────────────────────
     #  DYNAMIC OBSTACLE SPAWNING
     # ──────────────────────────────────────────
-    def _spawn_obstacle(self):
+    def _spawn_obstacle(self, exclude=()):
         """
         Randomly spawns a wall with probability spawn_prob%.
-        Returns True if it landed ON the current path (needs re-plan).
+        Returns True if it landed ON the current path (needs re-plan);
+        the new wall, if any, is left in self.last_spawn.
         """
+        self.last_spawn = None
         if random.random() > self.spawn_prob_var.get() / 100.0:
             return False
 
+        blocked = self._markers() | set(exclude)
         candidates = [
             (r, c) for r in range(self.rows) for c in range(self.cols)
             if self.grid[r][c] == 0
-            and (r, c) != self.start_pos
-            and (r, c) != self.target_pos
+            and (r, c) not in blocked
             and (r, c) != self.agent_pos
         ]
         if not candidates:
             return False
 
         r, c = random.choice(candidates)
-        self.grid[r][c] = -1
+        self._set_cell(r, c, -1)
         self._paint(r, c, C_OBSTACLE)
+        self.last_spawn = (r, c)
         return (r, c) in self.current_path
 
     # ──────────────────────────────────────────
@@ -843,10 +3139,10 @@ class DynamicPathfinderApp:
             self.agent_pos = (r, c)
 
             # Paint agent
+            t0 = time.perf_counter()
             if (r,c) not in (self.start_pos, self.target_pos):
                 self._paint(r, c, C_AGENT, "●")
-            self.root.update()
-            time.sleep(delay * 2)
+            self._show_frame(t0, delay * 2)
 
             # Leave path trail
             if (r,c) not in (self.start_pos, self.target_pos):
@@ -865,25 +3161,17 @@ class DynamicPathfinderApp:
                             self._paint(fr, fc, C_EMPTY)
 
                     self.nodes_visited = 0
-                    t0 = time.perf_counter()
-                    goal_node = self._search(r, c)
-                    self.exec_time_ms = (time.perf_counter()-t0)*1000
+                    new_path = self._plan(r, c)
                     self.replans += 1
 
-                    if goal_node is None:
+                    if new_path is None:
+                        if not self.running: return
                         self._set_status(" Stuck! No path after obstacle.", ACCENT_PINK)
                         self._update_metrics()
                         return
 
-                    new_path = self._extract_path(goal_node)
                     self._draw_path(new_path)
                     self.current_path = new_path
-                    self.path_cost    = sum(
-                        self._move_cost(
-                            new_path[i+1][0]-new_path[i][0],
-                            new_path[i+1][1]-new_path[i][1]
-                        ) for i in range(len(new_path)-1)
-                    )
                     idx = 0
                     self._update_metrics()
                     continue
@@ -903,6 +3191,21 @@ class DynamicPathfinderApp:
                 "Please place both Start (S) and Target (T) on the grid.")
             return
 
+        self.stats = SearchStats()
+        if self.deep_profile_var.get():
+            profile_call(self.stats, self._run_search)
+        else:
+            self._run_search()
+
+    def _run_search(self):
+        self.tour_order = []
+        if any(t for _, t in self.agent_pairs):
+            self._run_multi_agent()
+            return
+        if self.tour_goals:
+            self._run_tour()
+            return
+
         self._clear_path()
         self.running       = True
         self.nodes_visited = 0
@@ -914,28 +3217,18 @@ class DynamicPathfinderApp:
         self._set_status("Searching…", ACCENT_AMBER)
         self._update_metrics()
 
-        t0 = time.perf_counter()
-        goal_node = self._search(*self.start_pos)
-        self.exec_time_ms = (time.perf_counter() - t0) * 1000
+        path = self._plan(*self.start_pos)
 
         if not self.running:
             self._set_status("Stopped.", ACCENT_PINK)
             return
 
-        if goal_node is None:
+        if path is None:
             self._set_status("No path found! Remove some walls.", ACCENT_PINK)
             self._update_metrics()
             self.running = False
             return
 
-        path = self._extract_path(goal_node)
-        # Calculate actual path cost (using step costs)
-        self.path_cost = sum(
-            self._move_cost(
-                path[i+1][0]-path[i][0],
-                path[i+1][1]-path[i][1]
-            ) for i in range(len(path)-1)
-        )
         self._draw_path(path)
         self._update_metrics()
         self._set_status("✅ Path found! Agent moving…", ACCENT_GREEN)
@@ -946,15 +3239,471 @@ class DynamicPathfinderApp:
         self._update_metrics()
         self.running = False
 
+    # ──────────────────────────────────────────
+    #  WAYPOINT TOUR RUN
+    # ──────────────────────────────────────────
+    def _run_tour(self):
+        """
+        Visit every waypoint, then T, in the order TourPlanner finds
+        (nearest neighbour + 2-opt over one Dijkstra per stop).  A wall
+        spawned on the route ahead re-plans from the agent's cell; only
+        the trees whose legs it cut are rebuilt.
+        """
+        self._clear_path()
+        self.running   = True
+        self.replans   = 0
+        self.cache_hit = None
+        self.agent_pos = self.start_pos
+        remaining = list(self.tour_goals)
+        expanded0 = self.tour.expanded
+        builds0   = self.tour.builds
+
+        def plan(cell):
+            t0 = time.perf_counter()
+            order, cost, unreachable = self.tour.plan(cell, remaining, self.target_pos)
+            self.exec_time_ms  = (time.perf_counter() - t0) * 1000
+            self.nodes_visited = self.tour.expanded - expanded0
+            if unreachable:
+                self._set_status("Unreachable: " + ", ".join(f"{r},{c}" for r, c in unreachable),
+                                 ACCENT_PINK)
+                return None
+            self.path_cost  = cost
+            self.waypoints  = len(order)
+            self.tour_order = order
+            return self.tour.route(order)
+
+        self._set_status(f"Planning tour over {len(remaining)} waypoints…", ACCENT_AMBER)
+        self._update_metrics()
+        route = plan(self.start_pos)
+        if route is None:
+            self._update_metrics()
+            self.running = False
+            return
+
+        self._draw_path(route)
+        self._paint_markers()
+        self._update_metrics()
+        self._set_status("✅ Tour planned! Agent moving…", ACCENT_GREEN)
+        self.root.update()
+        time.sleep(0.3)
+
+        self.current_path = route
+        delay   = self.speed_var.get() / 1000.0
+        markers = self._markers()
+        idx     = 0
+        while idx < len(self.current_path) - 1 and self.running:
+            cell = self.current_path[idx]
+            self.agent_pos = cell
+            t0 = time.perf_counter()
+            if cell not in markers:
+                self._paint(*cell, C_AGENT, "●")
+            self._show_frame(t0, delay * 2)
+            if cell not in markers:
+                self._paint(*cell, C_PATH)
+            if cell in remaining:
+                remaining.remove(cell)
+
+            if self.dynamic_var.get():
+                self._spawn_obstacle()
+                if self.last_spawn in self.current_path[idx+1:]:
+                    self._set_status(" Obstacle! Re-planning tour...", ACCENT_AMBER)
+                    for fr, fc in self.current_path[idx+1:]:
+                        if (fr,fc) not in markers:
+                            self._paint(fr, fc, C_EMPTY)
+                    route = plan(cell)
+                    self.replans += 1
+                    if route is None:
+                        self._update_metrics()
+                        self.running = False
+                        return
+                    self._draw_path(route)
+                    self._paint_markers()
+                    self.current_path = route
+                    idx = 0
+                    self._update_metrics()
+                    continue
+            idx += 1
+
+        self._paint_markers()
+        self._paint(*self.target_pos, C_TARGET, "T")
+        if self.running:
+            self._set_status(f"✅ Tour complete — {len(self.tour_goals)} waypoints, "
+                             f"{self.tour.builds - builds0} Dijkstra runs.", ACCENT_GREEN)
+        self._update_metrics()
+        self.running = False
+
+    # ──────────────────────────────────────────
+    #  MULTI-AGENT RUN
+    # ──────────────────────────────────────────
+    def _run_multi_agent(self):
+        """
+        Plan S→T plus every complete agent pair with cooperative A*, then
+        walk all agents one tick at a time.  Only agents hit by a new wall
+        or a reservation conflict re-plan.
+        """
+        pairs = [(self.start_pos, self.target_pos)]
+        pairs += [tuple(p) for p in self.agent_pairs if p[1]]
+
+        self._clear_path()
+        self.running       = True
+        self.replans       = 0
+        self.cache_hit     = None
+        heuristic = self.heuristic_var.get()
+        if heuristic not in HEURISTICS:
+            heuristic = "Octile"        # cooperative search is spatial + time
+
+        self._set_status(f"Planning {len(pairs)} agents…", ACCENT_AMBER)
+        t0 = time.perf_counter()
+        planner = CooperativePlanner(occupancy_from_grid(self.grid),
+                                     self.rows, self.cols, heuristic)
+        for start, target in pairs:
+            planner.add_agent(start, target)
+        self.exec_time_ms = (time.perf_counter() - t0) * 1000
+
+        def plan_cells(agent):
+            return [divmod(i, self.cols) for i in agent.plan[max(planner.now - agent.t0, 0):]]
+
+        for agent in planner.agents:
+            self._draw_path(plan_cells(agent))
+        self.nodes_visited = planner.expanded
+        self.path_cost     = sum(path_cost(plan_cells(a)) for a in planner.agents)
+        self._update_metrics()
+        self.root.update()
+
+        delay   = self.speed_var.get() / 1000.0
+        markers = self._markers()
+        shown   = []
+        while self.running and not planner.all_done() \
+                and planner.now < self.rows * self.cols * 2:
+            replanned = []
+            if self.dynamic_var.get():
+                self._spawn_obstacle(exclude=planner.positions())
+                if self.last_spawn:
+                    replanned += planner.add_wall(*self.last_spawn)
+            replanned += planner.step()
+            self.replans += len(replanned)
+            t0 = time.perf_counter()
+            for agent in replanned:
+                self._draw_path(plan_cells(agent))
+
+            for cell in shown:
+                if cell not in markers: self._paint(*cell, C_PATH)
+            shown = planner.positions()
+            for agent, cell in zip(planner.agents, shown):
+                self._paint(*cell, C_AGENT, str(agent.id + 1))
+
+            self.nodes_visited = planner.expanded
+            self._update_metrics()
+            self._show_frame(t0, delay * 2)
+
+        self._paint_markers()
+        self._paint(*self.start_pos, C_START, "S")
+        self._paint(*self.target_pos, C_TARGET, "T")
+        if planner.all_done():
+            self._set_status(f"✅ All {len(pairs)} agents arrived "
+                             f"in {planner.now} ticks.", ACCENT_GREEN)
+        elif self.running:
+            self._set_status("Some agents are stuck.", ACCENT_PINK)
+        self._update_metrics()
+        self.running = False
+
     def _stop_search(self):
         self.running = False
         self._set_status("Stopped.", ACCENT_PINK)
 
+    def _export_profile(self):
+        """Save the last run's SearchStats (and run settings) as JSON."""
+        import json
+        fname = filedialog.asksaveasfilename(
+            title="Export profile", defaultextension=".json",
+            filetypes=[("JSON", "*.json")])
+        if not fname: return
+        data = {
+            "algorithm": self.algo_var.get(),
+            "heuristic": self.heuristic_var.get(),
+            "grid":      [self.rows, self.cols],
+            "nodes_visited": self.nodes_visited,
+            "path_cost":     self.path_cost,
+            "exec_time_ms":  self.exec_time_ms,
+            "replans":       self.replans,
+            "stats":         self.stats.as_dict(),
+        }
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        self._set_status(f"Profile saved to {fname}", ACCENT_CYAN)
+
 
 # ─────────────────────────────────────────────
 #  ENTRY POINT
 # ─────────────────────────────────────────────
+ALGO_ALIASES = {
+    "astar": "A*",
+    "gbfs":  "Greedy Best-First (GBFS)",
+    "theta": THETA_ALGO,
+    "ida":   IDA_ALGO,
+    "wavefront": WAVEFRONT_ALGO,
+}
+HEURISTIC_ALIASES = {name.lower(): name for name in HEURISTICS}
+HEURISTIC_ALIASES["alt"] = ALT_HEURISTIC
+
+def _parse_cell(text):
+    """'r,c' -> (r, c); ValueError names the bad text."""
+    try:
+        r, c = text.split(",")
+        return int(r), int(c)
+    except ValueError:
+        raise ValueError(f"expected a cell as r,c, got {text!r}") from None
+
+def _cell_arg(text):
+    """argparse type for one r,c cell: a bad value becomes a usage error."""
+    import argparse
+    try:
+        return _parse_cell(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+def _cells_arg(text):
+    """argparse type for a space-separated list of r,c cells."""
+    return [_cell_arg(tok) for tok in text.split()]
+
+def _check_cell(grid, what, cell, map_file=None):
+    """ValueError if `cell` is outside the grid, or on a wall of `map_file`."""
+    rows, cols = len(grid), len(grid[0])
+    r, c = cell
+    if not (0 <= r < rows and 0 <= c < cols):
+        raise ValueError(f"{what} {r},{c} is outside the {rows}x{cols} map")
+    if grid[r][c] == -1 and map_file:
+        raise ValueError(f"{what} {r},{c} is a wall in {map_file}")
+
+def _open_cells(grid, cells, args):
+    """
+    Check query cells against the map.  A cell outside it, or on a wall of
+    a --map file, is an error; on a random map the generator's wall is
+    simply cleared, as the GUI does for its markers.
+    """
+    for what, (r, c) in cells:
+        try:
+            _check_cell(grid, what, (r, c), args.map)
+        except ValueError as e:
+            raise SystemExit(str(e)) from None
+        grid[r][c] = 0
+
+def _query_from_args(args):
+    """Build (grid, start, target) from --map or a seeded random map."""
+    if args.map:
+        grid, start, target = load_map(args.map)
+    else:
+        rows, cols = args.rows, args.cols
+        rng  = random.Random(args.seed)
+        grid = [[-1 if rng.random() < args.density else 0 for _ in range(cols)]
+                for _ in range(rows)]
+        start = target = None
+    rows, cols = len(grid), len(grid[0])
+    start  = args.start  or start  or (1, 1)
+    target = args.target or target or (rows-2, cols-2)
+    _open_cells(grid, [("start", start), ("target", target)], args)
+    return grid, start, target
+
+def _run_tour_headless(args):
+    """Plan start → every --tour waypoint → target and return the JSON dict."""
+    grid, start, target = _query_from_args(args)
+    rows, cols = len(grid), len(grid[0])
+    goals = args.tour
+    _open_cells(grid, [("waypoint", cell) for cell in goals], args)
+    t0 = time.perf_counter()
+    tour = TourPlanner(occupancy_from_grid(grid), rows, cols)
+    order, cost, unreachable = tour.plan(start, goals, target)
+    elapsed = (time.perf_counter() - t0) * 1000
+    return {
+        "found":       not unreachable,
+        "order":       order,
+        "unreachable": unreachable,
+        "path":        tour.route(order) if order else [],
+        "cost":        round(cost, 3) if order else None,
+        "dijkstra_runs": tour.builds,
+        "time_ms":     round(elapsed, 3),
+    }
+
+def _run_distance_map(args):
+    """Save the wavefront distance map from the start cell as .npy; return a summary."""
+    np = _numpy()
+    grid, start, _ = _query_from_args(args)
+    rows, cols = len(grid), len(grid[0])
+    t0 = time.perf_counter()
+    dist = wavefront_distances(occupancy_from_grid(grid), rows, cols, start,
+                               diagonal=args.connectivity != 4)
+    elapsed = (time.perf_counter() - t0) * 1000
+    np.save(args.distance_map, dist)
+    return {"source": start, "rows": rows, "cols": cols,
+            "connectivity": args.connectivity or 8,
+            "reachable": int((dist >= 0).sum()), "max_distance": int(dist.max()),
+            "file": args.distance_map, "time_ms": round(elapsed, 3)}
+
+def _run_headless(args):
+    """Answer one query and return the result dict printed as JSON."""
+    if args.distance_map:
+        return _run_distance_map(args)
+    if args.tour:
+        return _run_tour_headless(args)
+    grid, start, target = _query_from_args(args)
+    rows, cols = len(grid), len(grid[0])
+    algo      = ALGO_ALIASES[args.algo]
+    heuristic = HEURISTIC_ALIASES[args.heuristic]
+    occ   = occupancy_from_grid(grid)
+    stats = SearchStats() if args.profile else None
+    trace = SearchTrace(rows, cols) if args.trace_out else None
+    diagonal = args.connectivity != 4
+
+    t0 = time.perf_counter()
+    landmarks = (LandmarkTable(occ, rows, cols)
+                 if heuristic == ALT_HEURISTIC and algo not in NO_HEURISTIC_ALGOS else None)
+    if trace is None:
+        route, expanded = find_path(occ, rows, cols, start, target, algo,
+                                    heuristic, landmarks, stats=stats,
+                                    tt_size=args.tt_size, diagonal=diagonal)
+    else:
+        h = landmarks.heuristic(target) if landmarks else heuristic
+        goal, expanded = search_grid(occ, rows, cols, start, target, algo, h,
+                                     on_expand=trace.expand, on_push=trace.push,
+                                     on_layer=trace.layer, stats=stats,
+                                     tt_size=args.tt_size, diagonal=diagonal)
+        route = extract_path(goal) if goal else []
+        trace.save(args.trace_out)
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    result = {
+        "found":     bool(route),
+        "algo":      algo,
+        "heuristic": ("Euclidean" if algo == THETA_ALGO else
+                      None if algo == WAVEFRONT_ALGO else heuristic),
+        "start":     start,
+        "target":    target,
+        "path":      densify(route) if algo == THETA_ALGO else route,
+        "cost":      round(path_cost(route), 3),
+        "expanded":  expanded,
+        "time_ms":   round(elapsed, 3),
+    }
+    if algo == THETA_ALGO: result["waypoints"] = route
+    if stats is not None:  result["stats"] = stats.as_dict()
+    return result
+
+def main(argv=None):
+    """
+    Command-line entry.  Without --headless (or --batch / --simulate / --bench) this
+    opens the GUI; otherwise it answers from the terminal and prints JSON.
+    --serve runs the planning service until interrupted.
+    """
+    import argparse, json, sys
+    ap = argparse.ArgumentParser(
+        description="Dynamic pathfinding agent — GUI or headless planner.")
+    ap.add_argument("--headless", action="store_true",
+                    help="answer one query without the GUI and print JSON")
+    ap.add_argument("--map", help="map file ('#' wall, '.' free, 'S'/'T' optional)")
+    ap.add_argument("--algo", choices=sorted(ALGO_ALIASES), default="astar")
+    ap.add_argument("--heuristic", choices=sorted(HEURISTIC_ALIASES), default="manhattan")
+    ap.add_argument("--start",  type=_cell_arg,
+                    help="start cell as r,c (default: map S or 1,1)")
+    ap.add_argument("--target", type=_cell_arg,
+                    help="target cell as r,c (default: map T or bottom-right)")
+    ap.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="random map rows (no --map)")
+    ap.add_argument("--cols", type=int, default=DEFAULT_COLS, help="random map cols (no --map)")
+    ap.add_argument("--density", type=float, default=0.28, help="random map wall density 0..1")
+    ap.add_argument("--seed", type=int, default=0, help="random map / simulation seed")
+    ap.add_argument("--tour", type=_cells_arg, metavar="'r,c r,c ...'",
+                    help="with --headless: visit these waypoints between start and target")
+    ap.add_argument("--distance-map", metavar="FILE.npy",
+                    help="with --headless: save the NumPy wavefront distance map from --start")
+    ap.add_argument("--connectivity", type=int, choices=(4, 8),
+                    help="moves for --algo wavefront paths and --distance-map, "
+                         "also the --serve default (default: 8)")
+    ap.add_argument("--profile", action="store_true", help="include SearchStats in the output")
+    ap.add_argument("--trace-out", metavar="FILE", help="save the search trace (.pftrace)")
+    ap.add_argument("--batch", metavar="FILE",
+                    help="plan every 'r,c r,c' line of FILE on --map across a process pool")
+    ap.add_argument("--simulate", type=int, metavar="N",
+                    help="run N Monte Carlo dynamic episodes and print the aggregate")
+    ap.add_argument("--spawn-prob", type=float, default=0.12, help="simulation spawn probability")
+    ap.add_argument("--strategy", choices=REPLAN_STRATEGIES, default="on-path")
+    ap.add_argument("--workers", type=int,
+                    help="process pool size for --batch and --serve (default: CPU count)")
+    ap.add_argument("--tt-size", type=int, default=DEFAULT_TT_SIZE,
+                    help="IDA* transposition table slots (capped at rows*cols)")
+    ap.add_argument("--bench", action="store_true",
+                    help="compare A* and IDA* expansions / peak memory on one query")
+    ap.add_argument("--serve", action="store_true",
+                    help="run the JSON-lines planning service (--map is preloaded as 'default')")
+    ap.add_argument("--socket", metavar="PATH", help="serve on this Unix socket instead of TCP")
+    ap.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT,
+                    help="localhost TCP port for --serve")
+    args = ap.parse_args(argv)
+    if (args.algo == "wavefront" or args.distance_map) and not numpy_available():
+        ap.error("the wavefront mode needs NumPy: pip install numpy")
+    if (args.connectivity == 4 and args.algo != "wavefront"
+            and not (args.distance_map or args.serve)):
+        ap.error("--connectivity 4 needs --algo wavefront or --distance-map; "
+                 "the other searches move 8 ways")
+
+    if args.serve:
+        import asyncio
+        service = PlanningService(workers=args.workers,
+                                  diagonal=args.connectivity != 4)
+        if args.map:
+            service.maps["default"] = MapSession(load_map(args.map)[0])
+        where = args.socket or f"127.0.0.1:{args.port}"
+        print(f"planning service listening on {where}", file=sys.stderr)
+        try:
+            asyncio.run(service.serve(args.socket, port=args.port))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass            # Ctrl-C or SIGTERM
+        return 0
+
+    if args.bench:
+        grid, start, target = _query_from_args(args)
+        out = benchmark_memory(grid, start, target,
+                               heuristic=HEURISTIC_ALIASES[args.heuristic],
+                               tt_size=args.tt_size)
+    elif args.simulate:
+        out = simulate_episodes(
+            args.simulate, seed=args.seed, workers=args.workers,
+            rows=args.rows, cols=args.cols, density=args.density,
+            spawn_prob=args.spawn_prob, algo=ALGO_ALIASES[args.algo],
+            heuristic=HEURISTIC_ALIASES[args.heuristic], strategy=args.strategy,
+            diagonal=args.connectivity != 4)
+    elif args.batch:
+        if not args.map:
+            ap.error("--batch needs --map")
+        grid, _, _ = load_map(args.map)
+        queries = []
+        with open(args.batch, encoding="utf-8") as f:
+            for n, ln in enumerate(f, start=1):
+                if not ln.strip(): continue
+                try:
+                    cells = [_parse_cell(tok) for tok in ln.split()]
+                    if len(cells) != 2:
+                        raise ValueError(f"expected 'r,c r,c', got {len(cells)} cell(s)")
+                    for what, cell in zip(("start", "target"), cells):
+                        _check_cell(grid, what, cell, args.map)
+                except ValueError as e:
+                    ap.error(f"{args.batch}:{n}: {e}")
+                queries.append(tuple(cells))
+        out = plan_batch(grid, queries, ALGO_ALIASES[args.algo],
+                         HEURISTIC_ALIASES[args.heuristic], workers=args.workers,
+                         diagonal=args.connectivity != 4)
+    elif args.headless:
+        out = _run_headless(args)
+    else:
+        _load_tk()
+        root = tk.Tk()
+        app  = DynamicPathfinderApp(root)
+        if args.map:
+            app.load_map(args.map)
+        root.mainloop()
+        return 0
+
+    json.dump(out, sys.stdout)
+    sys.stdout.write("\n")
+    return 0
+
+
 if __name__ == "__main__":
-    root = tk.Tk()
-    app  = DynamicPathfinderApp(root)
-    root.mainloop()
+    raise SystemExit(main())
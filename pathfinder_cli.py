@@ -0,0 +1,11 @@
+"""
+Command-line entry point: `python pathfinder_cli.py --headless ...`.
+
+Running mainpathfinder.py directly compiles the whole module on every
+start, since Python never caches bytecode for __main__.  Importing it from
+this stub lets the compiled module be reused from __pycache__.
+"""
+from mainpathfinder import main
+
+if __name__ == "__main__":
+    raise SystemExit(main())